@@ -0,0 +1,297 @@
+import argparse
+import hashlib
+import json
+import logging
+import random
+import sqlite3
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from h5p_cache import package_key
+from h5p_core import (
+    DEFAULT_TEMPLATE, QUESTION_RENDERERS, GenerationError, deterministic_uuids, fold_text, fragment_format,
+    process_input
+)
+from h5p_fragments import RawJSON
+from h5p_text import DEFAULT_NORMALIZER
+from h5p_validation import DEFAULT_VALIDATOR
+
+# SQLite limits the number of bound parameters per statement
+_MAX_PARAMETERS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    media_url TEXT,
+    course TEXT
+);
+CREATE INDEX IF NOT EXISTS questions_media_url ON questions (media_url);
+CREATE INDEX IF NOT EXISTS questions_course ON questions (course);
+CREATE TABLE IF NOT EXISTS question_tags (
+    tag TEXT NOT NULL,
+    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, question_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fragments (
+    options TEXT NOT NULL,
+    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    fragment TEXT NOT NULL,
+    PRIMARY KEY (options, question_id)
+) WITHOUT ROWID;
+"""
+
+
+def content_hash(question) -> str:
+    """
+    Hashes what makes two questions the same.
+
+    That is the type, the question text and the answers, ignoring case,
+    whitespace, the order of the options and all feedback texts.
+    """
+    if question["type"] == "MultipleChoice":
+        answers = sorted((fold_text(option["text"]), option.get("is_correct") is True) for option in question["options"])
+    else:
+        answers = question["correct_answer"]
+    canonical = json.dumps([question["type"], fold_text(question["question"]), answers], ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class IngestResult:
+    """Outcome of QuestionBank.add_questions."""
+    added: int
+    duplicates: int
+    issues: list  # ValidationIssue entries; questions with errors are not stored
+
+
+@dataclass(frozen=True)
+class BankSelection:
+    """Questions assembled from a bank, ready for process_input."""
+    json_data: dict  # The questions JSON, for the package key
+    questions: list  # Their pre-mapped fragments (RawJSON), for ``questions``
+
+
+class QuestionBank:
+    """
+    Local SQLite store of MultipleChoice and TrueFalse questions.
+
+    Questions are deduplicated by content_hash and indexed by tag, media URL
+    and course. Each question's mapped H5P fragment is cached per language and
+    text normalizer, so assembling a quiz is an indexed query plus a string
+    join; only questions not assembled with these options before are mapped.
+    Fragments get subContentIds derived from the question's hash, so a
+    question keeps its id in every quiz it is part of.
+
+    Args:
+        path (str or Path): The database file; created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    def add_questions(self, json_data, tags=(), media_url=None, course=None, validator=DEFAULT_VALIDATOR):
+        """
+        Stores the valid questions of a questions JSON in one transaction.
+
+        A question already in the bank is not stored again; it gains the new
+        tags, and the media URL and course if it had none. Questions may carry
+        their own ``tags`` list in addition to ``tags``.
+
+        Returns:
+            IngestResult: Counts and the validation issues of the input.
+        """
+        result = validator.validate(json_data)
+        if not isinstance(json_data, dict) or not isinstance(json_data.get("questions"), list):
+            return IngestResult(0, 0, result.issues)
+
+        rows, tag_rows = [], []
+        for index, question in enumerate(json_data["questions"]):
+            if index in result.invalid:
+                continue
+            digest = content_hash(question)
+            rows.append((digest, question["type"], json.dumps(question, ensure_ascii=False), media_url, course))
+            question_tags = question.get("tags") or ()
+            if isinstance(question_tags, str):
+                question_tags = [question_tags]
+            for tag in {*tags, *question_tags}:
+                tag_rows.append((str(tag), digest))
+
+        with self._db:
+            # New rows get ids above the current maximum
+            last_id = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+            self._db.executemany(
+                "INSERT INTO questions (hash, type, data, media_url, course) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (hash) DO UPDATE SET media_url = COALESCE(media_url, excluded.media_url), "
+                "course = COALESCE(course, excluded.course) WHERE media_url IS NULL OR course IS NULL",
+                rows
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO question_tags (tag, question_id) SELECT ?, id FROM questions WHERE hash = ?",
+                tag_rows
+            )
+            added = self._db.execute("SELECT COUNT(*) FROM questions WHERE id > ?", (last_id,)).fetchone()[0]
+        return IngestResult(added, len(rows) - added, result.issues)
+
+    def select(self, tags=(), media_url=None, course=None, limit=None, seed=None):
+        """
+        Returns the ids of the matching questions, in the order they were added.
+
+        Args:
+            tags (iterable[str]): Questions must have every one of these tags.
+            media_url (str, optional): Only questions for this media URL.
+            course (str, optional): Only questions of this course.
+            limit (int, optional): Pick at most this many at random.
+            seed (int, optional): Seed of the random pick, for repeatable quizzes.
+        """
+        # The ids come back as one string: building a tuple per matching row
+        # would cost more than the query for broad selections
+        tags = list(tags)
+        conditions, parameters = [], []
+        if tags:
+            query = "SELECT group_concat(question_id) FROM question_tags t WHERE tag = ?"
+            parameters.append(tags[0])
+            for tag in tags[1:]:
+                conditions.append("EXISTS (SELECT 1 FROM question_tags WHERE tag = ? AND question_id = t.question_id)")
+                parameters.append(tag)
+            question_filter = "EXISTS (SELECT 1 FROM questions WHERE id = t.question_id AND {} = ?)"
+        else:
+            query = "SELECT group_concat(id) FROM questions WHERE 1"
+            question_filter = "{} = ?"
+        for column, value in (("media_url", media_url), ("course", course)):
+            if value is not None:
+                conditions.append(question_filter.format(column))
+                parameters.append(value)
+        ids = self._db.execute(" AND ".join([query, *conditions]), parameters).fetchone()[0]
+        ids = ids.split(",") if ids else []
+        if limit is not None and limit < len(ids):
+            ids = [ids[index] for index in random.Random(seed).sample(range(len(ids)), limit)]
+        return sorted(map(int, ids))
+
+    def assemble(self, ids, language="de", normalizer=DEFAULT_NORMALIZER, messages=None):
+        """
+        Loads the questions with these ids and their fragments for process_input.
+
+        Fragments missing for this language and normalizer are mapped and
+        stored. Pass the result on as
+        ``process_input(json_data=selection.json_data, questions=selection.questions, ...)``.
+
+        Returns:
+            BankSelection: The questions in the order of ``ids``.
+        """
+        # Keyed by the fragment templates themselves, so changed templates never get stale fragments
+        options = package_key(format=fragment_format(language), language=language, normalizer=normalizer.key)
+        rows = {}
+        for start in range(0, len(ids), _MAX_PARAMETERS):
+            chunk = ids[start:start + _MAX_PARAMETERS]
+            rows.update((row[0], row[1:]) for row in self._db.execute(
+                "SELECT q.id, q.hash, q.type, q.data, f.fragment FROM questions q "
+                "LEFT JOIN fragments f ON f.options = ? AND f.question_id = q.id "
+                f"WHERE q.id IN ({', '.join('?' * len(chunk))})",
+                [options, *chunk]
+            ))
+
+        questions, fragments, mapped = [], [], []
+        for question_id in ids:
+            if question_id not in rows:
+                continue
+            digest, question_type, data, fragment = rows[question_id]
+            question = json.loads(data)
+            if fragment is None:
+                rendered = QUESTION_RENDERERS[question_type][1](question, messages, deterministic_uuids(digest), language, normalizer)
+                if rendered is None:
+                    continue
+                fragment = rendered.text
+                mapped.append((options, question_id, fragment))
+            questions.append(question)
+            fragments.append(RawJSON(fragment))
+        if mapped:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO fragments (options, question_id, fragment) VALUES (?, ?, ?)", mapped)
+        return BankSelection({"questions": questions}, fragments)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage a local question bank and build quizzes from it.")
+    parser.add_argument("bank", help="The question bank database (created if missing)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Add the questions of questions JSON files")
+    ingest.add_argument("files", nargs="+", help="Questions JSON files")
+    ingest.add_argument("--tag", action="append", default=[], help="Tag the questions (repeatable)")
+    ingest.add_argument("--media-url", default=None, help="Media URL the questions belong to")
+    ingest.add_argument("--course", default=None, help="Course the questions belong to")
+
+    build = commands.add_parser("build", help="Build a quiz package from the questions matching a query")
+    build.add_argument("output", help="The .h5p file to write")
+    build.add_argument("--tag", action="append", default=[], help="Only questions with this tag (repeatable)")
+    build.add_argument("--course", default=None, help="Only questions of this course")
+    build.add_argument("--media-url", required=True, help="Media URL of the quiz; also selects its questions")
+    build.add_argument("--any-media", action="store_true", help="Don't restrict the questions to --media-url")
+    build.add_argument("--media-type", choices=("video", "audio"), default="video")
+    build.add_argument("--limit", type=int, default=None, help="Pick this many questions at random")
+    build.add_argument("--seed", type=int, default=None, help="Seed of the random pick")
+    build.add_argument("--title", default="Video Quiz")
+    build.add_argument("--pool-size", type=int, default=7)
+    build.add_argument("--pass-percentage", type=int, default=75)
+    build.add_argument("--template", default=DEFAULT_TEMPLATE, help="Template ZIP archive")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with QuestionBank(args.bank) as bank:
+        if args.command == "ingest":
+            failures = 0
+            for path in args.files:
+                with open(path, encoding="utf-8") as f:
+                    json_data = json.load(f)
+                if isinstance(json_data, list):
+                    json_data = {"questions": json_data}
+                result = bank.add_questions(json_data, args.tag, args.media_url, args.course)
+                for issue in result.issues:
+                    print(f"  {path}: {issue} ({issue.level})", file=sys.stderr)
+                failures += any(issue.level == "error" for issue in result.issues)
+                print(f"{path}: {result.added} added, {result.duplicates} duplicates")
+            print(f"{len(bank)} questions in the bank")
+            return 1 if failures else 0
+
+        ids = bank.select(args.tag, None if args.any_media else args.media_url, args.course, args.limit, args.seed)
+        selection = bank.assemble(ids)
+        if not selection.questions:
+            print("Error: no questions match the query", file=sys.stderr)
+            return 1
+        try:
+            with open(args.output, "wb") as f:
+                process_input(
+                    media_url=args.media_url, media_type=args.media_type, json_data=selection.json_data,
+                    template_path=args.template, title=args.title, randomization=True, pool_size=args.pool_size,
+                    pass_percentage=args.pass_percentage, sink=f, questions=selection.questions
+                )
+        except GenerationError as e:
+            Path(args.output).unlink(missing_ok=True)
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        print(f"{args.output}: {len(selection.questions)} questions")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import h5p_metrics
+from h5p_cache import PackageCache
+from h5p_compression import PROFILES
+from h5p_core import DEFAULT_TEMPLATE, GenerationError, process_input
+from h5p_libraries import load_manifest
+from h5p_validation import ValidationIssue, validate_questions
+
+
+
+def load_specs(source, failures=None):
+    """
+    Loads quiz specs from a directory of ``*.json`` files or a JSONL file.
+
+    Each spec is a JSON object with the keys ``media_url``, ``media_type``,
+    ``questions`` (the questions JSON, inline or as a path to a JSON file),
+    ``title``, ``randomization``, ``pool_size``, ``pass_percentage`` and
+    ``image`` (path to a title image), ``media_file`` (path to a local audio
+    or video file, embedded instead of ``media_url``) and ``include_editor``.
+    Only ``questions`` is required.
+    Relative paths are resolved against the file the spec came from.
+
+    Args:
+        source (str or Path): A directory or a ``.jsonl`` file.
+        failures (dict, optional): Receives an error message per spec that
+            cannot be read, keyed by file stem or line number; such specs are
+            left out instead of aborting the batch.
+
+    Returns:
+        list[tuple[str, dict, Path]]: (spec id, spec, base directory) per spec.
+    """
+    source = Path(source)
+    failures = {} if failures is None else failures
+    specs = []
+    if source.is_dir():
+        for spec_file in sorted(source.glob("*.json")):
+            try:
+                with open(spec_file, encoding="utf-8") as f:
+                    spec = _check_spec(json.load(f))
+            except (OSError, ValueError) as e:
+                failures[spec_file.stem] = f"Cannot read the spec: {e}"
+                continue
+            specs.append((spec.get("id", spec_file.stem), spec, spec_file.parent))
+    else:
+        with open(source, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    spec = _check_spec(json.loads(line))
+                except ValueError as e:
+                    failures[f"line {line_no}"] = f"Cannot read the spec: {e}"
+                    continue
+                specs.append((str(spec.get("id", line_no)), spec, source.parent))
+    return specs
+
+
+def _check_spec(spec):
+    if not isinstance(spec, dict):
+        raise ValueError(f"Expected a JSON object, got {type(spec).__name__}")
+    return spec
+
+
+def output_name(spec_id, spec):
+    """Returns the file name of the package produced for a spec."""
+    return spec.get("output") or f"{spec_id}.h5p"
+
+
+def read_spec_inputs(spec, base_dir):
+    """
+    Reads the questions JSON and the title image of a spec.
+
+    Returns:
+        tuple[dict, bytes or None]: The questions JSON and the image bytes.
+    """
+    questions = spec["questions"]
+    if isinstance(questions, str):
+        with open(base_dir / questions, encoding="utf-8") as f:
+            questions = json.load(f)
+    if isinstance(questions, list):
+        questions = {"questions": questions}
+
+    image_bytes = None
+    if spec.get("image"):
+        image_bytes = (base_dir / spec["image"]).read_bytes()
+    return questions, image_bytes
+
+
+def validate_specs(specs):
+    """
+    Validates the questions of every spec without building anything.
+
+    Yields:
+        tuple[str, list[ValidationIssue]]: Each spec id with its issues, in order.
+    """
+    for spec_id, spec, base_dir in specs:
+        try:
+            questions, _ = read_spec_inputs(spec, base_dir)
+        except (OSError, ValueError, KeyError) as e:
+            yield spec_id, [ValidationIssue("$", "error", f"Cannot read the questions: {e}")]
+            continue
+        yield spec_id, validate_questions(questions).issues
+
+
+def build_one(spec_id, spec, base_dir, output_path, template_path, deterministic=False, cache_dir=None, installed_libraries=None,
+              compression=None):
+    """
+    Builds a single package and writes it to ``output_path``.
+
+    Runs inside a worker process. Specs whose questions have validation errors
+    are rejected before anything is written. The package is written to a
+    temporary file and renamed, so an interrupted run never leaves a partial
+    output behind. A ``compression`` key in the spec overrides ``compression``.
+
+    Returns:
+        tuple[str, str or None, BuildTrace]: The spec id, an error message or
+        None on success, and the metrics recorded while building.
+    """
+    with h5p_metrics.collect() as build:
+        return (*_build_one(spec_id, spec, base_dir, output_path, template_path, deterministic, cache_dir,
+                            installed_libraries, compression), build)
+
+
+def _build_one(spec_id, spec, base_dir, output_path, template_path, deterministic, cache_dir, installed_libraries,
+               compression):
+    try:
+        questions, image_bytes = read_spec_inputs(spec, base_dir)
+        errors = validate_questions(questions).errors
+        if errors:
+            return spec_id, f"{len(errors)} validation errors, first: {errors[0]}"
+
+        tmp_path = output_path.with_name(output_path.name + ".part")
+        try:
+            with open(tmp_path, "wb") as f:
+                process_input(
+                    media_url=spec.get("media_url", ""),
+                    media_type=spec.get("media_type", "video"),
+                    json_data=questions,
+                    template_path=template_path,
+                    title=spec.get("title", "Video Quiz"),
+                    randomization=spec.get("randomization", True),
+                    pool_size=spec.get("pool_size", 7),
+                    pass_percentage=spec.get("pass_percentage", 75),
+                    user_image=image_bytes,
+                    media_file=base_dir / spec["media_file"] if spec.get("media_file") else None,
+                    include_editor=spec.get("include_editor", True),
+                    installed_libraries=installed_libraries,
+                    sink=f,
+                    deterministic=deterministic,
+                    compression=spec.get("compression", compression),
+                    # Validated above already
+                    validator=None,
+                    # Disk-only: each worker process would otherwise hold its own copy
+                    cache=PackageCache(max_bytes=0, directory=cache_dir) if cache_dir else None
+                )
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, output_path)
+        return spec_id, None
+    except GenerationError as e:
+        return spec_id, str(e)
+    except Exception as e:
+        return spec_id, f"{type(e).__name__}: {e}"
+
+
+def run_batch(specs, output_dir, template_path=DEFAULT_TEMPLATE, workers=None, max_in_flight=None, force=False,
+              deterministic=False, cache_dir=None, installed_libraries=None, compression=None):
+    """
+    Builds packages for all specs in a process pool.
+
+    At most ``max_in_flight`` specs are submitted at any time, so memory stays
+    bounded for large batches. Specs whose output already exists are skipped
+    unless ``force`` is set. With ``cache_dir``, finished packages are also
+    stored by content hash and reused for specs with identical inputs.
+    With ``installed_libraries``, content-only packages are written.
+    ``compression`` names the compression profile (see h5p_compression).
+
+    Returns:
+        tuple[int, int, dict]: Number of packages built, number skipped, and
+        error messages keyed by spec id.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+
+    built, skipped, failures = 0, 0, {}
+    pending = {}  # future -> spec id
+
+    def collect(futures):
+        nonlocal built
+        for future in futures:
+            spec_id = pending.pop(future)
+            try:
+                done_id, error, build = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); the specs it had are lost
+                done_id, error = spec_id, f"Worker process crashed: {e}"
+            else:
+                # Workers have their own registries; replay the build's metrics in this process
+                for stage, seconds, fields in build.stages:
+                    h5p_metrics.record_stage(stage, seconds, **fields)
+                if build.package:
+                    h5p_metrics.record_package(build.package["bytes_in"], build.package["bytes_out"])
+            if error:
+                failures[done_id] = error
+            else:
+                built += 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for spec_id, spec, base_dir in specs:
+            output_path = output_dir / output_name(spec_id, spec)
+            if output_path.exists() and not force:
+                skipped += 1
+                continue
+
+            if len(pending) >= max_in_flight:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            try:
+                future = pool.submit(
+                    build_one, spec_id, spec, base_dir, output_path, template_path, deterministic, cache_dir,
+                    installed_libraries, compression
+                )
+            except BrokenProcessPool as e:
+                failures[spec_id] = f"Worker process crashed: {e}"
+                continue
+            pending[future] = spec_id
+
+        collect(wait(pending).done)
+
+    return built, skipped, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate H5P quiz packages from a batch of quiz specs.")
+    parser.add_argument("source", help="Directory of *.json specs or a .jsonl file with one spec per line")
+    parser.add_argument("output_dir", nargs="?", help="Directory the .h5p files are written to")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Template ZIP archive")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Specs queued at once (default: 2 x workers)")
+    parser.add_argument("--force", action="store_true", help="Rebuild packages that already exist")
+    parser.add_argument("--deterministic", action="store_true", help="Produce identical packages for identical inputs")
+    parser.add_argument("--cache-dir", default=None, help="Directory for the content-addressed package cache")
+    parser.add_argument("--manifest", default=None,
+                        help="Write content-only packages for a host with the libraries in this manifest")
+    parser.add_argument("--compression", choices=list(PROFILES), default="balanced",
+                        help="Compression profile for specs that do not set one")
+    parser.add_argument("--validate-only", action="store_true", help="Only validate the questions of every spec")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write the build metrics here in the Prometheus text format, e.g. for node_exporter")
+    args = parser.parse_args(argv)
+    if not args.output_dir and not args.validate_only:
+        parser.error("output_dir is required unless --validate-only is given")
+
+    logging.basicConfig(level=logging.INFO)
+    load_failures = {}
+    specs = load_specs(args.source, load_failures)
+    if args.validate_only:
+        for spec_id, error in load_failures.items():
+            print(f"  {spec_id}: {error}", file=sys.stderr)
+        valid, invalid = 0, len(load_failures)
+        for spec_id, issues in validate_specs(specs):
+            for issue in issues:
+                print(f"  {spec_id}: {issue} ({issue.level})", file=sys.stderr)
+            if any(issue.level == "error" for issue in issues):
+                invalid += 1
+            else:
+                valid += 1
+        print(f"{valid} valid, {invalid} invalid")
+        return 1 if invalid else 0
+
+    built, skipped, failures = run_batch(
+        specs, args.output_dir, template_path=Path(args.template).resolve(),
+        workers=args.workers, max_in_flight=args.max_in_flight, force=args.force,
+        deterministic=args.deterministic, cache_dir=args.cache_dir,
+        installed_libraries=load_manifest(args.manifest) if args.manifest else None,
+        compression=args.compression
+    )
+    failures.update(load_failures)
+    if args.metrics_file:
+        h5p_metrics.write_prometheus(args.metrics_file)
+
+    print(f"{built} built, {skipped} skipped, {len(failures)} failed")
+    for spec_id, error in sorted(failures.items()):
+        print(f"  {spec_id}: {error}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import argparse
+import itertools
+import json
+import platform
+import random
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timezone
+
+from h5p_core import (
+    DEFAULT_TEMPLATE, TITLE_IMAGE_SIZE, create_full_content_structure, create_h5p_package, render_questions
+)
+from h5p_validation import validate_questions
+from h5p_fragments import dumps
+from h5p_images import prepare_title_image
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+STAGES = ("image", "validation", "mapping", "structure", "serialization", "zip")
+MEDIA_URLS = {"video": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "audio": "https://example.com/lecture.mp3"}
+
+# Every benchmark image is unique, so the image cache never hides processing time
+_image_seeds = itertools.count()
+
+# Differences below these are treated as noise when comparing against a baseline
+MIN_TIME_DELTA = 0.002
+MIN_MEMORY_DELTA = 256 * 1024
+
+
+def synthetic_bank(size, seed=0):
+    """Generates a reproducible questions JSON with alternating MultipleChoice/TrueFalse items."""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(size):
+        text = f"Frage {i}: Welche Aussage über die Straße Nr. {rng.randint(1, 999)} ist korrekt?"
+        if i % 2 == 0:
+            correct = rng.randrange(4)
+            questions.append({
+                "type": "MultipleChoice",
+                "question": text,
+                "options": [
+                    {"text": f"Antwort {j} – {rng.random():.6f}", "is_correct": j == correct, "feedback": f"Rückmeldung zu {j}."}
+                    for j in range(4)
+                ]
+            })
+        else:
+            questions.append({
+                "type": "TrueFalse",
+                "question": text,
+                "correct_answer": rng.random() < 0.5,
+                "feedback_correct": "Genau, das ist richtig.",
+                "feedback_incorrect": "Leider falsch, schau dir das Video noch einmal an."
+            })
+    return {"questions": questions}
+
+
+def synthetic_png(seed, width=640, height=480):
+    """Builds an RGB PNG with noisy content, without requiring Pillow."""
+    rng = random.Random(seed)
+    row = bytes(rng.getrandbits(8) for _ in range(width * 3))
+    raw = b"".join(b"\x00" + row[i:] + row[:i] for i in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def run_pipeline(bank, media_type, image, template_path):
+    """
+    Runs the generation pipeline once, stage by stage.
+
+    Returns:
+        tuple[dict, int]: Duration of each stage in seconds, and the package size.
+    """
+    timings = {}
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    title_image = timed("image", lambda: prepare_title_image(image, size=TITLE_IMAGE_SIZE) if image else None)
+    timed("validation", validate_questions, bank)
+    questions = timed("mapping", render_questions, bank)
+    content = timed(
+        "structure", create_full_content_structure, questions, MEDIA_URLS[media_type], media_type,
+        "Benchmark Quiz", True, 7, 75, background_image=title_image
+    )
+    content_json = timed("serialization", dumps, content)
+    package = timed("zip", create_h5p_package, content_json, template_path, "Benchmark Quiz", title_image)
+    return timings, len(package)
+
+
+def run_case(size, media_type, with_image, template_path, repeat):
+    """Benchmarks one configuration; stage times are the best of ``repeat`` runs."""
+    bank = synthetic_bank(size)
+    best = {}
+    package_size = 0
+    for _ in range(repeat):
+        image = synthetic_png(seed=next(_image_seeds)) if with_image else None
+        timings, package_size = run_pipeline(bank, media_type, image, template_path)
+        for stage, seconds in timings.items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+
+    # Memory is measured in a separate run because tracing slows everything down
+    image = synthetic_png(seed=next(_image_seeds)) if with_image else None
+    tracemalloc.start()
+    try:
+        run_pipeline(bank, media_type, image, template_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "case": f"{size}-{media_type}-{'image' if with_image else 'noimage'}",
+        "questions": size,
+        "media_type": media_type,
+        "image": with_image,
+        "stages": best,
+        "total": sum(best.values()),
+        "peak_memory": peak,
+        "package_bytes": package_size,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares results with a baseline run.
+
+    Returns:
+        list[str]: One line per regression; empty if there are none.
+    """
+    previous = {entry["case"]: entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry["case"])
+        if old is None:
+            continue
+        checks = [(f"stage {stage}", seconds, old["stages"].get(stage), MIN_TIME_DELTA) for stage, seconds in entry["stages"].items()]
+        checks.append(("total", entry["total"], old["total"], MIN_TIME_DELTA))
+        checks.append(("peak memory", entry["peak_memory"], old["peak_memory"], MIN_MEMORY_DELTA))
+        for name, new_value, old_value, min_delta in checks:
+            if old_value is None:
+                continue
+            if new_value > old_value * (1 + tolerance) and new_value - old_value > min_delta:
+                regressions.append(f"{entry['case']}: {name} {old_value:.6g} -> {new_value:.6g} (+{(new_value / old_value - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the H5P generation pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Question bank sizes")
+    parser.add_argument("--media", nargs="+", default=list(MEDIA_URLS), choices=list(MEDIA_URLS), help="Media types")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Template ZIP archive")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the results")
+    parser.add_argument("--baseline", help="Fail if results regress against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        for media_type in args.media:
+            for with_image in (False, True):
+                entry = run_case(size, media_type, with_image, args.template, args.repeat)
+                results.append(entry)
+                stages = "  ".join(f"{stage}={entry['stages'][stage] * 1000:.2f}ms" for stage in STAGES)
+                print(f"{entry['case']:>22}  total={entry['total'] * 1000:.2f}ms  peak={entry['peak_memory'] / 1e6:.1f}MB  {stages}")
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def package_key(**inputs) -> str:
+    """
+    Derives a content address from everything that determines a package.
+
+    Bytes values (images, template digests) are hashed first; everything
+    else is serialized as canonical JSON.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    canonical = {
+        name: hashlib.sha256(value).hexdigest() if isinstance(value, (bytes, bytearray)) else value
+        for name, value in inputs.items()
+    }
+    encoded = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class PackageCache:
+    """
+    Thread-safe LRU cache of finished packages, optionally backed by a directory.
+
+    Entries are evicted from memory once their combined size exceeds
+    ``max_bytes``. With a ``directory``, every package is also written to disk
+    and survives restarts; disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self._max_bytes = max_bytes
+        self._directory = Path(directory) if directory else None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def _path(self, key):
+        return self._directory / key[:2] / f"{key}.h5p"
+
+    def get(self, key):
+        """Returns the cached package for ``key``, or None."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+
+        if self._directory:
+            try:
+                data = self._path(key).read_bytes()
+            except FileNotFoundError:
+                return None
+            self._remember(key, data)
+            return data
+        return None
+
+    def put(self, key, data: bytes):
+        """Stores a package under ``key``."""
+        self._remember(key, data)
+        if self._directory:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key, data):
+        if len(data) > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                logging.debug(f"Evicted {len(evicted)} byte package from cache")
+
+    def clear(self):
+        """Drops all in-memory entries; files on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,1129 @@
+import functools
+import json
+import io
+import itertools
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import h5p_metrics
+from h5p_cache import package_key
+from h5p_compression import DEFAULT_POLICY, get_policy, template_source
+from h5p_images import ImageError, prepare_title_image
+from h5p_fragments import FragmentTemplate, dumps, field, raw_array
+from h5p_media import MediaError, prepare_media
+from h5p_libraries import check_installed, content_libraries, dependency_list, get_library_graph
+from h5p_templates import get_template
+from h5p_text import DEFAULT_NORMALIZER, fold_text
+from h5p_validation import DEFAULT_VALIDATOR
+from h5p_zip import CHUNK_SIZE, ChunkBuffer, PackageWriter, build_block
+
+
+# Template archive shipped with the project
+DEFAULT_TEMPLATE = Path(__file__).parent / "templates" / "col_vid_mc_tf.zip"
+
+# Main library of every generated package
+MAIN_LIBRARY = ("H5P.Column", 1, 18)
+
+# Displayed size of the title image on the quiz intro page, in CSS pixels
+TITLE_IMAGE_SIZE = (52, 52)
+
+# Timestamp of generated members in deterministic builds (earliest DOS date)
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class GenerationError(Exception):
+    """Raised when an H5P package cannot be generated from the given input."""
+
+
+@dataclass(frozen=True)
+class Message:
+    """A non-fatal message produced while generating a package."""
+    level: str  # "info", "warning" or "error"
+    text: str
+
+
+@dataclass(frozen=True)
+class Variant:
+    """Settings of one package built by iter_variants."""
+    name: str
+    randomization: bool = True
+    pool_size: int = 7
+    pass_percentage: int = 75
+    title: str = None  # Defaults to the quiz title
+    shuffle_seed: int = None  # Shuffles the question order, e.g. for fixed-order exam versions
+
+
+_LOG_LEVELS = {"info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+
+def report(messages, level, text):
+    """Logs a message and appends it to ``messages`` when a list is given."""
+    logging.log(_LOG_LEVELS[level], text)
+    if messages is not None:
+        messages.append(Message(level, text))
+
+class MediaType(Enum):
+    VIDEO = "video"
+    AUDIO = "audio"
+
+# Function to generate a unique UUID
+def generate_uuid():
+    return str(uuid.uuid4())
+
+def deterministic_uuids(seed: str):
+    """
+    Returns an ID factory that yields the same UUID sequence for the same seed.
+
+    Use it in place of generate_uuid to make identical inputs produce
+    identical subContentIds.
+
+    Args:
+        seed (str): A stable digest of the inputs.
+
+    Returns:
+        callable: A function returning the next UUID string on each call.
+    """
+    counter = itertools.count()
+    return lambda: str(uuid.uuid5(uuid.NAMESPACE_OID, f"{seed}/{next(counter)}"))
+
+# Localized texts of the question libraries, keyed by language and library
+QUESTION_TEXTS = {
+    "de": {
+        "H5P.MultiChoice": {
+            "UI": {
+                "checkAnswerButton": "Überprüfen",
+                "submitAnswerButton": "Absenden",
+                "showSolutionButton": "Lösung anzeigen",
+                "tryAgainButton": "Wiederholen",
+                "tipsLabel": "Hinweis anzeigen",
+                "scoreBarLabel": "Du hast :num von :total Punkten erreicht.",
+                "tipAvailable": "Hinweis verfügbar",
+                "feedbackAvailable": "Rückmeldung verfügbar",
+                "readFeedback": "Rückmeldung vorlesen",
+                "wrongAnswer": "Falsche Antwort",
+                "correctAnswer": "Richtige Antwort",
+                "shouldCheck": "Hätte gewählt werden müssen",
+                "shouldNotCheck": "Hätte nicht gewählt werden sollen",
+                "noInput": "Bitte antworte, bevor du die Lösung ansiehst",
+                "a11yCheck": "Die Antworten überprüfen. Die Auswahlen werden als richtig, falsch oder fehlend markiert.",
+                "a11yShowSolution": "Die Lösung anzeigen. Die richtigen Lösungen werden in der Aufgabe angezeigt.",
+                "a11yRetry": "Die Aufgabe wiederholen. Alle Versuche werden zurückgesetzt und die Aufgabe wird erneut gestartet."
+            },
+            "confirmCheck": {
+                "header": "Beenden?",
+                "body": "Ganz sicher beenden?",
+                "cancelLabel": "Abbrechen",
+                "confirmLabel": "Beenden"
+            },
+            "confirmRetry": {
+                "header": "Wiederholen?",
+                "body": "Ganz sicher wiederholen?",
+                "cancelLabel": "Abbrechen",
+                "confirmLabel": "Bestätigen"
+            }
+        },
+        "H5P.TrueFalse": {
+            "l10n": {
+                "trueText": "Wahr",
+                "falseText": "Falsch",
+                "score": "Du hast @score von @total Punkten erreicht.",
+                "checkAnswer": "Überprüfen",
+                "submitAnswer": "Absenden",
+                "showSolutionButton": "Lösung anzeigen",
+                "tryAgain": "Wiederholen",
+                "wrongAnswerMessage": "Falsche Antwort",
+                "correctAnswerMessage": "Richtige Antwort",
+                "scoreBarLabel": "Du hast :num von :total Punkten erreicht.",
+                "a11yCheck": "Die Antworten überprüfen. Die Antwort wird als richtig, falsch oder unbeantwortet markiert.",
+                "a11yShowSolution": "Die Lösung anzeigen. Die richtige Lösung wird in der Aufgabe angezeigt.",
+                "a11yRetry": "Die Aufgabe wiederholen. Alle Versuche werden zurückgesetzt, und die Aufgabe wird erneut gestartet."
+            },
+            "confirmCheck": {
+                "header": "Beenden?",
+                "body": "Ganz sicher beenden?",
+                "cancelLabel": "Abbrechen",
+                "confirmLabel": "Beenden"
+            },
+            "confirmRetry": {
+                "header": "Wiederholen?",
+                "body": "Ganz sicher wiederholen?",
+                "cancelLabel": "Abbrechen",
+                "confirmLabel": "Bestätigen"
+            }
+        }
+    }
+}
+
+def _question_texts(language, library):
+    """Returns fresh copies of the localized text blocks of a question library."""
+    try:
+        texts = QUESTION_TEXTS[language][library]
+    except KeyError:
+        raise GenerationError(f"No {library} texts for language '{language}'") from None
+    return {block: dict(strings) for block, strings in texts.items()}
+
+def _map_answer(option, normalizer=DEFAULT_NORMALIZER):
+    return {
+        "text": normalizer(option.get("text", "")),
+        "correct": option.get("is_correct", False),
+        "tipsAndFeedback": {
+            "tip": "",
+            "chosenFeedback": f"<div>{normalizer(option.get('feedback', ''))}</div>\n",
+            "notChosenFeedback": ""
+        }
+    }
+
+# Function to map MultipleChoice questions to H5P format
+def map_multiple_choice(question, messages=None, id_factory=generate_uuid, language="de", normalizer=DEFAULT_NORMALIZER):
+    try:
+        texts = _question_texts(language, "H5P.MultiChoice")
+        h5p_question = {
+            "library": "H5P.MultiChoice 1.16",
+            "params": {
+                "question": normalizer(question.get("question", "Keine Frage gestellt.")),
+                "answers": [],
+                "behaviour": {
+                    "singleAnswer": True,
+                    "enableRetry": False,
+                    "enableSolutionsButton": False,
+                    "enableCheckButton": True,
+                    "type": "auto",
+                    "singlePoint": False,
+                    "randomAnswers": True,  # This will be controlled globally
+                    "showSolutionsRequiresInput": True,
+                    "confirmCheckDialog": False,
+                    "confirmRetryDialog": False,
+                    "autoCheck": False,
+                    "passPercentage": 100,
+                    "showScorePoints": True
+                },
+                "media": {
+                    "disableImageZooming": False
+                },
+                "overallFeedback": [
+                    {
+                        "from": 0,
+                        "to": 100
+                    }
+                ],
+                "UI": texts["UI"],
+                "confirmCheck": texts["confirmCheck"],
+                "confirmRetry": texts["confirmRetry"]
+            },
+            "subContentId": id_factory(),
+            "metadata": {
+                "contentType": "Multiple Choice",
+                "license": "U",
+                "title": "Multiple Choice",
+                "authors": [],
+                "changes": [],
+                "extraTitle": "Multiple Choice"
+            }
+        }
+
+        options = question.get("options", [])
+        if not isinstance(options, list):
+            report(messages, "warning", f"'options' is not a list in MultipleChoice question: {question.get('question', 'Keine Frage')}")
+            return h5p_question
+
+        for option in options:
+            h5p_question["params"]["answers"].append(_map_answer(option, normalizer))
+
+        return h5p_question
+
+    except Exception as e:
+        report(messages, "error", f"Error mapping MultipleChoice question: {e}")
+        return {}
+
+# Function to map TrueFalse questions to H5P format
+def map_true_false(question, messages=None, id_factory=generate_uuid, language="de", normalizer=DEFAULT_NORMALIZER):
+    try:
+        correct_answer = question.get("correct_answer", False)
+        feedback_correct = normalizer(question.get("feedback_correct", ""))
+        feedback_incorrect = normalizer(question.get("feedback_incorrect", ""))
+        texts = _question_texts(language, "H5P.TrueFalse")
+
+        h5p_question = {
+            "library": "H5P.TrueFalse 1.8",
+            "params": {
+                "question": normalizer(question.get("question", "Keine Frage gestellt.")),
+                "correct": "true" if correct_answer else "false",
+                "behaviour": {
+                    "enableRetry": False,
+                    "enableSolutionsButton": False,
+                    "enableCheckButton": True,
+                    "confirmCheckDialog": False,
+                    "confirmRetryDialog": False,
+                    "autoCheck": False,
+                    "feedbackOnCorrect": feedback_correct,
+                    "feedbackOnWrong": feedback_incorrect
+                },
+                "media": {
+                    "disableImageZooming": False
+                },
+                "l10n": texts["l10n"],
+                "confirmCheck": texts["confirmCheck"],
+                "confirmRetry": texts["confirmRetry"]
+            },
+            "subContentId": id_factory(),
+            "metadata": {
+                "contentType": "True/False Question",
+                "license": "U",
+                "title": "Richtig Falsch",
+                "authors": [],
+                "changes": [],
+                "extraTitle": "Richtig Falsch"
+            }
+        }
+
+        return h5p_question
+
+    except Exception as e:
+        report(messages, "error", f"Error mapping TrueFalse question: {e}")
+        return {}
+
+@functools.lru_cache(maxsize=None)
+def _fragment_templates(language):
+    """
+    Serializes the invariant parts of each question library once per language.
+
+    The skeletons come from the regular mapping functions, with every
+    per-question value replaced by a field marker.
+    """
+    if language not in QUESTION_TEXTS:
+        raise GenerationError(f"Unsupported language '{language}'")
+    marker_id = lambda: field("subContentId")
+
+    multiple_choice = map_multiple_choice({"question": field("question")}, id_factory=marker_id, language=language)
+    multiple_choice["params"]["answers"] = field("answers")
+
+    answer = _map_answer({"text": field("text")})
+    answer["correct"] = field("correct")
+    answer["tipsAndFeedback"]["chosenFeedback"] = field("chosenFeedback")
+
+    true_false = map_true_false({"question": field("question")}, id_factory=marker_id, language=language)
+    true_false["params"]["correct"] = field("correct")
+    true_false["params"]["behaviour"]["feedbackOnCorrect"] = field("feedbackOnCorrect")
+    true_false["params"]["behaviour"]["feedbackOnWrong"] = field("feedbackOnWrong")
+
+    return {
+        "MultipleChoice": FragmentTemplate(multiple_choice),
+        "answer": FragmentTemplate(answer),
+        "TrueFalse": FragmentTemplate(true_false),
+    }
+
+@functools.lru_cache(maxsize=None)
+def fragment_format(language):
+    """
+    Identifies the serialized question fragments of ``language``.
+
+    Derived from the static text of the fragment templates, so it changes
+    with the library versions, UI texts and skeletons; fragments stored
+    under it (see h5p_bank) are never reused after such a change.
+    """
+    return package_key(**{name: template.digest for name, template in _fragment_templates(language).items()})
+
+def render_multiple_choice(question, messages=None, id_factory=generate_uuid, language="de", normalizer=DEFAULT_NORMALIZER):
+    """
+    Serializes a MultipleChoice question straight to JSON text.
+
+    Produces the same JSON as ``json.dumps(map_multiple_choice(...))`` but
+    only encodes the per-question fields.
+
+    Returns:
+        RawJSON or None: The serialized question, or None if mapping failed.
+    """
+    try:
+        templates = _fragment_templates(language)
+        options = question.get("options", [])
+        if not isinstance(options, list):
+            report(messages, "warning", f"'options' is not a list in MultipleChoice question: {question.get('question', 'Keine Frage')}")
+            options = []
+
+        answers = raw_array(
+            templates["answer"].render(
+                text=normalizer(option.get("text", "")),
+                correct=option.get("is_correct", False),
+                chosenFeedback=f"<div>{normalizer(option.get('feedback', ''))}</div>\n"
+            )
+            for option in options
+        )
+        return templates["MultipleChoice"].render(
+            question=normalizer(question.get("question", "Keine Frage gestellt.")),
+            answers=answers,
+            subContentId=id_factory()
+        )
+
+    except Exception as e:
+        report(messages, "error", f"Error mapping MultipleChoice question: {e}")
+        return None
+
+def render_true_false(question, messages=None, id_factory=generate_uuid, language="de", normalizer=DEFAULT_NORMALIZER):
+    """
+    Serializes a TrueFalse question straight to JSON text.
+
+    Returns:
+        RawJSON or None: The serialized question, or None if mapping failed.
+    """
+    try:
+        return _fragment_templates(language)["TrueFalse"].render(
+            question=normalizer(question.get("question", "Keine Frage gestellt.")),
+            correct="true" if question.get("correct_answer", False) else "false",
+            feedbackOnCorrect=normalizer(question.get("feedback_correct", "")),
+            feedbackOnWrong=normalizer(question.get("feedback_incorrect", "")),
+            subContentId=id_factory()
+        )
+
+    except Exception as e:
+        report(messages, "error", f"Error mapping TrueFalse question: {e}")
+        return None
+
+# Question types of the input schema, the libraries they map to and their renderers
+QUESTION_RENDERERS = {
+    "MultipleChoice": ("H5P.MultiChoice", render_multiple_choice),
+    "TrueFalse": ("H5P.TrueFalse", render_true_false),
+}
+        
+def extract_youtube_id(url):
+    """
+    Extracts the YouTube video ID from a given URL.
+    Supports both standard and shortened YouTube URLs.
+
+    Args:
+        url (str): The YouTube URL.
+
+    Returns:
+        str or None: The extracted YouTube ID or None if extraction fails.
+    """
+    try:
+        parsed_url = urlparse(url)
+        if parsed_url.hostname in ['www.youtube.com', 'youtube.com']:
+            # Handle URLs like https://www.youtube.com/watch?v=ID
+            query_params = parse_qs(parsed_url.query)
+            return query_params.get('v', [None])[0]
+        elif parsed_url.hostname in ['youtu.be']:
+            # Handle URLs like https://youtu.be/ID
+            return parsed_url.path.lstrip('/')
+        else:
+            return None
+    except Exception as e:
+        logging.error(f"Error parsing YouTube URL: {e}")
+        return None
+
+def create_full_content_structure(questions, media_url, media_type, title, randomization, pool_size, pass_percentage, messages=None, id_factory=generate_uuid,
+                                  background_image=None, media=None):
+    """
+    Create the complete H5P content structure with either video or audio.
+
+    Args:
+        background_image (TitleImage, optional): Image shown on the quiz intro page.
+        media (EmbeddedMedia, optional): Local media file stored in the package;
+            used instead of ``media_url``.
+
+    Raises:
+        GenerationError: If the media URL is invalid or the structure cannot be built.
+    """
+    try:
+        content = []
+
+        # 1. Add Intro Text
+        intro_text = (
+            "<p>Schauen Sie das Video und beantworten Sie die Verständnisfragen unterhalb des Videos</p>"
+            if media_type == "video"
+            else "<p>Hören Sie den Audiobeitrag und beantworten Sie die Verständnisfragen.</p>"
+        )
+        
+        content.append({
+            "content": {
+                "params": {"text": intro_text},
+                "library": "H5P.AdvancedText 1.1",
+                "metadata": {
+                    "contentType": "Text",
+                    "license": "U",
+                    "title": "Intro Text",
+                    "authors": [],
+                    "changes": []
+                },
+                "subContentId": id_factory()
+            },
+            "useSeparator": "auto"
+        })
+
+        # 2. Add Media Section
+        if media_type == "video":
+            # Video handling
+            if media:
+                source = {"path": media.path, "mime": media.mime, "copyright": {"license": "U"}}
+            else:
+                youtube_id = extract_youtube_id(media_url)
+                if youtube_id:
+                    reconstructed_url = f"https://www.youtube.com/watch?v={youtube_id}"
+                    report(messages, "info", f"Extracted YouTube ID: {youtube_id}")
+                else:
+                    raise GenerationError("Invalid YouTube URL format. Please provide a valid YouTube watch or share link.")
+                source = {
+                    "path": reconstructed_url,  # Use the reconstructed standard URL
+                    "mime": "video/YouTube",
+                    "copyright": {"license": "U"},
+                    "aspectRatio": "16:9"
+                }
+
+            media_content = {
+                "params": {
+                    "visuals": {"fit": True, "controls": True},
+                    "playback": {"autoplay": False, "loop": False},
+                    "l10n": {
+                        "name": "Video",
+                        "loading": "Videoplayer lädt...",
+                        "noPlayers": "Keine Videoplayer gefunden, die das vorliegende Videoformat unterstützen.",
+                        "noSources": "Es wurden für das Video keine Quellen angegeben.",
+                        "aborted": "Das Abspielen des Videos wurde abgebrochen.",
+                        "networkFailure": "Netzwerkfehler.",
+                        "cannotDecode": "Dekodierung des Mediums nicht möglich.",
+                        "formatNotSupported": "Videoformat wird nicht unterstützt.",
+                        "mediaEncrypted": "Medium verschlüsselt.",
+                        "unknownError": "Unbekannter Fehler.",
+                        "invalidYtId": "Ungültige YouTube-ID.",
+                        "unknownYtId": "Video mit dieser YouTube-ID konnte nicht gefunden werden.",
+                        "restrictedYt": "Der Besitzer dieses Videos erlaubt kein Einbetten."
+                    },
+                    "sources": [source]
+                },
+                "library": "H5P.Video 1.6",
+                "metadata": {
+                    "contentType": "Video",
+                    "license": "U",
+                    "title": "Video Content",
+                    "authors": [],
+                    "changes": [],
+                    "extraTitle": "Video Content"
+                },
+                "subContentId": id_factory()
+            }
+        else:
+            # Audio handling
+            media_content = {
+                "params": {
+                    "playerMode": "full",
+                    "fitToWrapper": False,
+                    "controls": True,
+                    "autoplay": False,
+                    "playAudio": "Audio abspielen",
+                    "pauseAudio": "Audio pausieren",
+                    "contentName": "Audio",
+                    "audioNotSupported": "Dein Browser unterstützt diese Tondatei nicht.",
+                    "files": [{
+                        "path": media.path if media else media_url,
+                        "mime": media.mime if media else "audio/mp3",
+                        "copyright": {"license": "U"}
+                    }]
+                },
+                "library": "H5P.Audio 1.5",
+                "metadata": {
+                    "contentType": "Audio",
+                    "license": "U",
+                    "title": "Audio Content",
+                    "authors": [],
+                    "changes": [],
+                    "extraTitle": "Audio Content"
+                },
+                "subContentId": id_factory()
+            }
+
+        content.append({
+            "content": media_content,
+            "useSeparator": "auto"
+        })
+
+        # 3. Add Question Set
+        question_set = {
+            "useSeparator": "auto",
+            "content": {
+                "library": "H5P.QuestionSet 1.20",
+                "params": {
+                    "introPage": {
+                        "showIntroPage": True,
+                        "startButtonText": "Quiz starten",
+                        "title": title,
+                        "introduction": f"<p style='text-align:center'><strong>Starten Sie das Quiz zu diesem {'Video' if media_type == 'video' else 'Audio'}inhalt.</strong></p>"
+                                        f"<p style='text-align:center'>Es werden zufällig {pool_size} Fragen angezeigt.</p>"
+                    },
+                    "progressType": "textual",
+                    "passPercentage": pass_percentage,
+                    "disableBackwardsNavigation": True,
+                    "randomQuestions": randomization,
+                    "endGame": {
+                        "showResultPage": True,
+                        "showSolutionButton": True,
+                        "showRetryButton": True,
+                        "noResultMessage": "Quiz beendet",
+                        "message": "Dein Ergebnis:",
+                        "scoreBarLabel": "Du hast @score von @total Punkten erreicht.",
+                        "overallFeedback": [
+                            {"from": 0, "to": 50, "feedback": "Kein Grund zur Sorge! Tipp: Schau dir die Lösungen an, bevor du in die nächste Runde startest."},
+                            {"from": 51, "to": 75, "feedback": "Du weisst schon einiges über das Thema. Mit jeder Wiederholung kannst du dich steigern."},
+                            {"from": 76, "to": 100, "feedback": "Gut gemacht!"}
+                        ],
+                        "solutionButtonText": "Lösung anzeigen",
+                        "retryButtonText": "Nächste Runde",
+                        "finishButtonText": "Beenden",
+                        "submitButtonText": "Absenden",
+                        "showAnimations": False,
+                        "skippable": False,
+                        "skipButtonText": "Video überspringen"
+                    },
+                    "override": {"checkButton": True},
+                    "texts": {
+                        "prevButton": "Zurück",
+                        "nextButton": "Weiter",
+                        "finishButton": "Beenden",
+                        "submitButton": "Absenden",
+                        "textualProgress": "Frage @current von @total",
+                        "jumpToQuestion": "Frage %d von %total",
+                        "questionLabel": "Frage",
+                        "readSpeakerProgress": "Frage @current von @total",
+                        "unansweredText": "Unbeantwortet",
+                        "answeredText": "Beantwortet",
+                        "currentQuestionText": "Aktuelle Frage",
+                        "navigationLabel": "Fragen"
+                    },
+                    "poolSize": pool_size,
+                    "questions": questions
+                },
+                "metadata": {
+                    "contentType": "Question Set",
+                    "license": "U",
+                    "title": title,
+                    "authors": [],
+                    "changes": []
+                },
+                "subContentId": id_factory()
+            }
+        }
+
+        if background_image:
+            question_set["content"]["params"]["introPage"]["backgroundImage"] = {
+                "path": background_image.path,
+                "mime": background_image.mime,
+                "copyright": {"license": "U"},
+                "width": background_image.width,
+                "height": background_image.height
+            }
+
+        content.append(question_set)
+
+        return {"content": content}
+
+    except GenerationError:
+        raise
+    except Exception as e:
+        logging.error(f"Content creation error: {str(e)}")
+        raise GenerationError(f"Error creating content structure: {e}") from e
+
+def render_questions(json_data, messages=None, id_factory=generate_uuid, language="de", normalizer=DEFAULT_NORMALIZER):
+    """
+    Maps every supported question in the questions JSON to a serialized fragment.
+
+    Each text field is passed through ``normalizer`` (see h5p_text.TextNormalizer).
+
+    Returns:
+        list[RawJSON]: The mapped questions; failed ones are reported and skipped.
+    """
+    _fragment_templates(language)
+    questions = []
+    for q in json_data.get("questions", []):
+        question_type = q.get("type")
+        if question_type == "MultipleChoice":
+            mapped_q = render_multiple_choice(q, messages, id_factory, language, normalizer)
+            if mapped_q:  # Ensure mapping was successful
+                questions.append(mapped_q)
+        elif question_type == "TrueFalse":
+            mapped_q = render_true_false(q, messages, id_factory, language, normalizer)
+            if mapped_q:  # Ensure mapping was successful
+                questions.append(mapped_q)
+    return questions
+
+def prepare_questions(json_data, messages=None, deterministic=False, language="de", normalizer=DEFAULT_NORMALIZER,
+                      validator=DEFAULT_VALIDATOR, id_factory=None):
+    """
+    Validates and renders the questions of a questions JSON for process_input.
+
+    Every validation issue is reported with its JSON path, and questions with
+    errors are skipped. In deterministic mode the subContentIds are derived
+    from the questions and the language only, so the result can be cached and
+    reused with any other settings; process_input derives them the same way.
+
+    Args:
+        validator (QuestionValidator, optional): Checks the questions first;
+            None skips validation, e.g. for input validated already.
+        id_factory (callable, optional): Supplies the subContentIds instead.
+
+    Returns:
+        list[RawJSON]: The mapped questions; failed ones are reported and skipped.
+
+    Raises:
+        GenerationError: If ``json_data`` has no questions list at all.
+    """
+    valid_data = json_data
+    if validator is not None:
+        with h5p_metrics.stage("validation") as fields:
+            result = validator.validate(json_data)
+            fields.update(errors=len(result.errors), warnings=len(result.issues) - len(result.errors))
+        for issue in result.issues:
+            report(messages, issue.level, str(issue))
+        if not isinstance(json_data, dict) or not isinstance(json_data.get("questions"), list):
+            raise GenerationError(f"Invalid questions JSON: {result.issues[0]}")
+        if result.invalid:
+            valid_data = {"questions": [q for index, q in enumerate(json_data["questions"]) if index not in result.invalid]}
+
+    with h5p_metrics.stage("mapping", language=language) as fields:
+        if id_factory is None:
+            id_factory = deterministic_uuids(package_key(json_data=json_data, language=language)) if deterministic else generate_uuid
+        questions = render_questions(valid_data, messages, id_factory, language, normalizer)
+        fields["questions"] = len(questions)
+    return questions
+
+def load_title_image(user_image, image_format):
+    """
+    Prepares the title image of a package (see h5p_images.prepare_title_image).
+
+    Returns:
+        TitleImage or None: The image, or None without ``user_image``.
+
+    Raises:
+        GenerationError: If the image cannot be read.
+    """
+    if not user_image:
+        return None
+    try:
+        with h5p_metrics.stage("image", bytes_in=len(user_image)) as fields:
+            title_image = prepare_title_image(user_image, size=TITLE_IMAGE_SIZE, image_format=image_format)
+            fields["bytes_out"] = len(title_image.data)
+        return title_image
+    except ImageError as e:
+        raise GenerationError(str(e)) from e
+
+def load_media(media_file, media_type):
+    """
+    Inspects a local media file for embedding (see h5p_media.prepare_media).
+
+    Returns:
+        EmbeddedMedia or None: The media, or None without ``media_file``.
+
+    Raises:
+        GenerationError: If the file cannot be read or has an unsupported format.
+    """
+    if media_file is None:
+        return None
+    try:
+        with h5p_metrics.stage("media", media_type=media_type) as fields:
+            media = prepare_media(media_file, media_type)
+            fields["bytes_in"] = media.size
+        return media
+    except MediaError as e:
+        raise GenerationError(str(e)) from e
+
+def resolve_compression(compression):
+    """
+    Resolves a compression profile name or policy (see h5p_compression.get_policy).
+
+    Raises:
+        GenerationError: If there is no profile of that name.
+    """
+    try:
+        return get_policy(compression)
+    except ValueError as e:
+        raise GenerationError(str(e)) from e
+
+def _compression_key(policy):
+    # Only non-default policies enter cache keys, so existing keys stay as they were
+    return {} if policy == DEFAULT_POLICY else {"compression": repr(policy)}
+
+def process_input(media_url, media_type, json_data, template_path, title, randomization, pool_size, pass_percentage, user_image=None, messages=None, sink=None, deterministic=False, cache=None, language="de", include_editor=True,
+                  installed_libraries=None, image_format="png", questions=None, normalizer=DEFAULT_NORMALIZER, media_file=None,
+                  compression=None, validator=DEFAULT_VALIDATOR):
+    """
+    Builds a complete H5P package from the questions JSON and settings.
+
+    Args:
+        messages (list, optional): Receives non-fatal Message entries.
+        sink (file-like, optional): Receives the package instead of returning it.
+        deterministic (bool): Derive subContentIds from a hash of the content
+            inputs and use fixed ZIP timestamps, so identical inputs give
+            identical bytes. Packaging options (template, include_editor,
+            installed_libraries, image_format) don't change the IDs, so
+            packages stay diffable across template updates.
+        cache (PackageCache, optional): Returns previously built packages for
+            identical inputs and stores new ones.
+        language (str): Language of the question UI texts (see QUESTION_TEXTS).
+        include_editor (bool): Ship the editor libraries with the package.
+        installed_libraries (dict, optional): Write a content-only package for a
+            host with these library versions (see create_h5p_package).
+        image_format (str): Output format of the title image, "png" or "webp".
+        questions (list, optional): The questions of ``json_data`` as returned by
+            prepare_questions with the same ``deterministic``, ``language`` and
+            ``normalizer``, or assembled from a question bank (see
+            h5p_bank.QuestionBank.assemble); skips mapping them again.
+        normalizer (TextNormalizer): Applied to every question text and the title.
+        media_file (str or Path, optional): Local audio or video file to store in
+            the package instead of referencing ``media_url``. It is streamed
+            into the package, so pass a ``sink`` to keep it out of memory;
+            such packages are never cached.
+        compression (str or CompressionPolicy, optional): Compression profile,
+            "fast", "balanced" (the default) or "smallest" (see h5p_compression).
+        validator (QuestionValidator, optional): Checks the questions before
+            mapping them; None skips validation, e.g. for input validated already.
+
+    Returns:
+        bytes or None: The .h5p package, or None when it was written to ``sink``.
+
+    Raises:
+        GenerationError: If no package can be generated from the input.
+    """
+    try:
+        policy = resolve_compression(compression)
+        media = load_media(media_file, media_type)
+        if media is not None:
+            # Caching would hold the whole recording in memory
+            cache = None
+
+        # The content key seeds deterministic subContentIds; the cache key adds
+        # the inputs that only affect packaging
+        content_key = package_key(
+            json_data=json_data, media_url=media_url, media_type=media_type, title=title,
+            randomization=randomization, pool_size=pool_size, pass_percentage=pass_percentage,
+            user_image=user_image, language=language, normalizer=normalizer.key,
+            media=(media.mime, media.size, media.crc) if media else None
+        ) if deterministic or cache is not None else None
+        if cache is not None:
+            key = package_key(
+                content=content_key, template=get_template(template_path).sha256, deterministic=deterministic,
+                include_editor=include_editor,
+                installed_libraries=sorted(installed_libraries.items()) if installed_libraries is not None else None,
+                image_format=image_format, **_compression_key(policy)
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                h5p_metrics.count("cache_hits_total")
+                if sink is None:
+                    return cached
+                sink.write(cached)
+                return None
+
+        id_factory = deterministic_uuids(content_key) if deterministic else generate_uuid
+        title = normalizer(title)
+
+        title_image = load_title_image(user_image, image_format)
+
+        if questions is None:
+            questions = prepare_questions(json_data, messages, deterministic, language, normalizer, validator)
+        if not questions:
+            raise GenerationError("No valid questions found in the JSON.")
+        h5p_metrics.count("questions_total", len(questions))
+
+        # Create full content structure with MEDIA parameters
+        with h5p_metrics.stage("structure", media_type=media_type):
+            content = create_full_content_structure(
+                questions=questions,
+                media_url=media_url,
+                media_type=media_type,  # Add this parameter
+                title=title,
+                randomization=randomization,
+                pool_size=pool_size,
+                pass_percentage=pass_percentage,
+                messages=messages,
+                id_factory=id_factory,
+                background_image=title_image,
+                media=media
+            )
+
+        with h5p_metrics.stage("serialization") as fields:
+            content_json = dumps(content)
+            fields["chars"] = len(content_json)
+
+        # Create in-memory H5P package
+        package = create_h5p_package(
+            content_json=content_json,
+            template_zip_path=template_path,
+            title=title,
+            title_image=title_image,
+            sink=sink if cache is None else None,
+            date_time=FIXED_DATE_TIME if deterministic else None,
+            include_editor=include_editor,
+            installed_libraries=installed_libraries,
+            media=media,
+            compression=policy
+        )
+        if cache is None:
+            return package
+
+        cache.put(key, package)
+        if sink is None:
+            return package
+        sink.write(package)
+        return None
+    except GenerationError:
+        raise
+    except Exception as e:
+        raise GenerationError(f"Processing error: {e}") from e
+
+def iter_variants(media_url, media_type, json_data, template_path, title, variants, user_image=None, messages=None, deterministic=False,
+                  language="de", include_editor=True, installed_libraries=None, image_format="png", normalizer=DEFAULT_NORMALIZER,
+                  media_file=None, compression=None, sink_factory=None):
+    """
+    Builds several packages of the same quiz with different settings.
+
+    The questions are mapped and the title image processed once; the template
+    is read and its library members laid out once, and every variant writes
+    those bytes followed by its own content.json and h5p.json. All variants
+    share the questions' subContentIds.
+
+    Args:
+        variants (list[Variant]): The packages to build; names must be unique.
+        sink_factory (callable, optional): Called with each Variant; returns
+            the file-like sink its package is written to, which is then
+            yielded in place of the bytes. Required with ``media_file``, so
+            the recording is streamed into each sink rather than held in
+            memory once per variant.
+        Other arguments are as for process_input.
+
+    Yields:
+        tuple[Variant, bytes or file-like]: Each variant with its .h5p package
+        or its sink, in order.
+
+    Raises:
+        GenerationError: If the packages cannot be generated from the input.
+    """
+    try:
+        names = [variant.name for variant in variants]
+        if len(set(names)) != len(names):
+            raise GenerationError("Variant names must be unique.")
+
+        policy = resolve_compression(compression)
+        media = load_media(media_file, media_type)
+        if media is not None and sink_factory is None:
+            raise GenerationError("Variants with an embedded media file must be written to sinks (see sink_factory).")
+        key = package_key(
+            json_data=json_data, media_url=media_url, media_type=media_type, title=title, user_image=user_image,
+            language=language, normalizer=normalizer.key,
+            media=(media.mime, media.size, media.crc) if media else None
+        ) if deterministic else None
+        title_image = load_title_image(user_image, image_format)
+        questions = prepare_questions(json_data, messages, deterministic, language, normalizer)
+        if not questions:
+            raise GenerationError("No valid questions found in the JSON.")
+
+        template = None
+        for variant in variants:
+            variant_questions = list(questions)
+            if variant.shuffle_seed is not None:
+                random.Random(variant.shuffle_seed).shuffle(variant_questions)
+            variant_title = normalizer(variant.title or title)
+            with h5p_metrics.stage("structure", media_type=media_type, variant=variant.name):
+                content = create_full_content_structure(
+                    variant_questions, media_url, media_type, variant_title, variant.randomization, variant.pool_size,
+                    variant.pass_percentage, messages,
+                    id_factory=deterministic_uuids(f"{key}/{variant}") if deterministic else generate_uuid,
+                    background_image=title_image, media=media
+                )
+            with h5p_metrics.stage("serialization", variant=variant.name) as fields:
+                content_json = dumps(content)
+                fields["chars"] = len(content_json)
+
+            # Every variant needs the same libraries, so they are copied only once
+            if template is None:
+                template = get_template(template_path)
+                with h5p_metrics.stage("template_copy") as fields:
+                    members, runtime_libraries = select_libraries(template, content_libraries(content_json), include_editor,
+                                                                   installed_libraries)
+                    source, members = template_source(template, members, policy)
+                    block = build_block(members, source)
+                    fields.update(members=len(members), bytes_out=len(block.data))
+
+            output = io.BytesIO() if sink_factory is None else sink_factory(variant)
+            writer = PackageWriter(output)
+            writer.extend(block)
+            for _ in _write_generated(writer, content_json, variant_title, runtime_libraries, title_image,
+                                      FIXED_DATE_TIME if deterministic else None, media, policy):
+                pass
+            yield variant, output.getvalue() if sink_factory is None else output
+    except GenerationError:
+        raise
+    except Exception as e:
+        raise GenerationError(f"Processing error: {e}") from e
+
+def select_libraries(template, used_libraries, include_editor=True, installed_libraries=None):
+    """
+    Resolves the libraries a package with this content needs.
+
+    Args:
+        used_libraries (list): Library keys referenced by the content (see content_libraries).
+
+    Returns:
+        tuple[list, list]: The template members to copy, and the runtime
+        libraries to list in h5p.json.
+
+    Raises:
+        GenerationError: If a content-only package would miss libraries on the host.
+    """
+    # Resolve only the libraries the content actually uses
+    graph = get_library_graph(template)
+    roots = [MAIN_LIBRARY] + list(used_libraries)
+    libraries = graph.resolve(roots, include_editor=include_editor)
+    runtime_libraries = graph.resolve(roots, include_editor=False)
+    members = graph.members(libraries)
+
+    # Content-only package: the host must already have every runtime library
+    if installed_libraries is not None:
+        missing, outdated = check_installed(runtime_libraries, installed_libraries)
+        if missing:
+            names = ", ".join(f"{lib.machine_name} {lib.major_version}.{lib.minor_version}" for lib in missing)
+            raise GenerationError(f"Content-only package would not resolve, libraries missing on the host: {names}")
+        for lib in outdated:
+            logging.warning(f"Host has an older patch version of {lib.machine_name} {lib.major_version}.{lib.minor_version} than the template")
+        members = []
+    return members, runtime_libraries
+
+def _write_package(writer, content_json, template_zip_path, title, title_image=None, date_time=None, include_editor=True,
+                   installed_libraries=None, media=None, policy=DEFAULT_POLICY):
+    """Writes every package member to ``writer``, yielding after each one."""
+    template = get_template(template_zip_path)
+    members, runtime_libraries = select_libraries(template, content_libraries(content_json), include_editor, installed_libraries)
+
+    # Copy their files as raw compressed records (no inflate/deflate round trip),
+    # from the template or its copy recompressed for the policy.
+    # Stage timers skip the time spent by consumers between yields.
+    start = time.perf_counter()
+    source, members = template_source(template, members, policy)
+    elapsed = time.perf_counter() - start
+    for member in members:
+        start = time.perf_counter()
+        writer.copy(member, source)
+        elapsed += time.perf_counter() - start
+        yield
+    h5p_metrics.record_stage("template_copy", elapsed, members=len(members), bytes_out=writer.size)
+
+    yield from _write_generated(writer, content_json, title, runtime_libraries, title_image, date_time, media, policy)
+
+def h5p_json(title, runtime_libraries) -> bytes:
+    """Serializes the h5p.json of a package with this title and these runtime libraries."""
+    h5p_content = {
+        "embedTypes": ["iframe"],
+        "language": "en",
+        "defaultLanguage": "de",
+        "license": "U",
+        "extraTitle": title,
+        "title": title,
+        "mainLibrary": MAIN_LIBRARY[0],
+        "preloadedDependencies": dependency_list(runtime_libraries)
+    }
+    return json.dumps(h5p_content, indent=4).encode("utf-8")
+
+def _write_generated(writer, content_json, title, runtime_libraries, title_image=None, date_time=None, media=None,
+                     policy=DEFAULT_POLICY):
+    """Writes the generated members and closes ``writer``, yielding after each member or media chunk."""
+    # Add content.json
+    start = time.perf_counter()
+    copied = writer.size
+    policy.write(writer, "content/content.json", content_json.encode("utf-8"), date_time)
+    elapsed = time.perf_counter() - start
+    yield
+
+    # Stream the embedded media file, stored since audio and video are compressed already
+    if media:
+        media_elapsed = 0.0
+        start = time.perf_counter()
+        for _ in writer.write_chunks(f"content/{media.path}", media.chunks(), media.size, media.crc, date_time=date_time):
+            media_elapsed += time.perf_counter() - start
+            yield
+            start = time.perf_counter()
+        media_elapsed += time.perf_counter() - start
+        h5p_metrics.record_stage("media_copy", media_elapsed, bytes_out=media.size)
+        copied += media.size
+
+    # Add image if provided (already compressed, so the policy stores it as-is)
+    if title_image:
+        start = time.perf_counter()
+        policy.write(writer, f"content/{title_image.path}", title_image.data, date_time)
+        elapsed += time.perf_counter() - start
+        yield
+
+    # Create and add h5p.json with dynamic titles
+    start = time.perf_counter()
+    policy.write(writer, "h5p.json", h5p_json(title, runtime_libraries), date_time)
+    writer.close()
+    elapsed += time.perf_counter() - start
+    h5p_metrics.record_stage("zip_finalize", elapsed, bytes_out=writer.size - copied)
+    h5p_metrics.record_package(writer.uncompressed_size, writer.size)
+    yield
+
+def create_h5p_package(content_json, template_zip_path, title, title_image=None, sink=None, date_time=None, include_editor=True,
+                       installed_libraries=None, media=None, compression=None):
+    """
+    Assembles the .h5p archive from the template and the generated content.
+
+    Args:
+        title_image (TitleImage, optional): Processed title image, referenced
+            by the content's intro page.
+        sink (file-like, optional): Binary object with a ``write`` method that
+            receives the archive as it is produced. It is never seeked, so
+            sockets and HTTP response streams work as well as files.
+        date_time (tuple, optional): Timestamp for the generated members;
+            defaults to the current time.
+        include_editor (bool): Also ship the editor libraries, so the content
+            can be edited on hosts that don't have them installed.
+        installed_libraries (dict, optional): Library versions installed on the
+            target host (see h5p_libraries.load_manifest). When given, a
+            content-only package without any library files is written, after
+            checking that the host has every library it needs.
+        media (EmbeddedMedia, optional): Local media file referenced by the
+            content; streamed into the package in chunks.
+        compression (str or CompressionPolicy, optional): Decides per member
+            whether and how hard to deflate it (see h5p_compression).
+
+    Returns:
+        bytes or None: The package, or None when it was written to ``sink``.
+
+    Raises:
+        GenerationError: If the package cannot be written.
+    """
+    try:
+        output = io.BytesIO() if sink is None else sink
+        for _ in _write_package(PackageWriter(output), content_json, template_zip_path, title, title_image, date_time, include_editor,
+                                installed_libraries, media, resolve_compression(compression)):
+            pass
+        return output.getvalue() if sink is None else None
+    except GenerationError:
+        raise
+    except Exception as e:
+        logging.error(f"Package creation error: {str(e)}")
+        raise GenerationError(f"Package creation failed: {e}") from e
+
+def iter_h5p_package(content_json, template_zip_path, title, title_image=None, chunk_size=CHUNK_SIZE, date_time=None, include_editor=True,
+                     installed_libraries=None, media=None, compression=None):
+    """
+    Generates the .h5p archive as a stream of byte chunks.
+
+    Only about ``chunk_size`` bytes (or one member, if larger) of output are
+    held in memory at a time, which suits chunked HTTP responses.
+
+    Raises:
+        GenerationError: If the package cannot be written.
+    """
+    buffer = ChunkBuffer(chunk_size)
+    try:
+        for _ in _write_package(PackageWriter(buffer), content_json, template_zip_path, title, title_image, date_time, include_editor,
+                                installed_libraries, media, resolve_compression(compression)):
+            yield from buffer.drain()
+    except GenerationError:
+        raise
+    except Exception as e:
+        logging.error(f"Package creation error: {str(e)}")
+        raise GenerationError(f"Package creation failed: {e}") from e
+    yield from buffer.drain(final=True)
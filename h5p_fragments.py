@@ -0,0 +1,90 @@
+import hashlib
+import json
+import re
+from json.encoder import encode_basestring
+
+# A field marker survives json.dumps as the literal text "\u0000name\u0000"
+_MARKER = "\x00{}\x00"
+_MARKER_PATTERN = re.compile(r'"\\u0000(\w+)\\u0000"')
+
+
+class RawJSON:
+    """Already serialized JSON text that is spliced into the output verbatim."""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self):
+        return f"RawJSON({self.text!r})"
+
+
+def field(name: str) -> str:
+    """Returns the marker for a variable field in a fragment skeleton."""
+    return _MARKER.format(name)
+
+
+def _encode(value):
+    # Fast paths for the common field types; same output as json.dumps(value, ensure_ascii=False)
+    if type(value) is str:
+        return encode_basestring(value)
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, RawJSON):
+        return value.text
+    return json.dumps(value, ensure_ascii=False)
+
+
+class FragmentTemplate:
+    """
+    A JSON document serialized once, with holes for its variable fields.
+
+    The skeleton is any JSON-serializable object in which variable values
+    are replaced by ``field(name)`` markers. Rendering serializes only the
+    field values and joins them with the precomputed static text, producing
+    exactly what ``json.dumps(..., ensure_ascii=False)`` would for the full
+    document.
+    """
+
+    def __init__(self, skeleton):
+        parts = _MARKER_PATTERN.split(json.dumps(skeleton, ensure_ascii=False))
+        self._head = parts[0]
+        self._pieces = tuple(zip(parts[1::2], parts[2::2]))
+
+    @property
+    def digest(self) -> str:
+        """A SHA-256 of the static text and field names, which identifies what the template renders."""
+        return hashlib.sha256(json.dumps([self._head, self._pieces]).encode("utf-8")).hexdigest()
+
+    def render(self, **values) -> RawJSON:
+        out = [self._head]
+        for name, static in self._pieces:
+            out.append(_encode(values[name]))
+            out.append(static)
+        return RawJSON("".join(out))
+
+
+def raw_array(items) -> RawJSON:
+    """Joins rendered fragments into a JSON array, formatted like json.dumps."""
+    return RawJSON("[" + ", ".join(_encode(item) for item in items) + "]")
+
+
+def dumps(obj) -> str:
+    """
+    Serializes ``obj`` like ``json.dumps(obj, ensure_ascii=False)``, splicing
+    RawJSON values in verbatim instead of re-encoding them.
+    """
+    raw = []
+
+    def placeholder(value):
+        if not isinstance(value, RawJSON):
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+        raw.append(value.text)
+        return field(str(len(raw) - 1))
+
+    text = json.dumps(obj, ensure_ascii=False, default=placeholder)
+    if not raw:
+        return text
+    return _MARKER_PATTERN.sub(lambda m: raw[int(m.group(1))], text)
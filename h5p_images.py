@@ -0,0 +1,155 @@
+import hashlib
+import io
+import logging
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Magic numbers of the accepted upload formats
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/gif": "gif", "image/webp": "webp"}
+_CACHE_SIZE = 128
+
+
+class ImageError(ValueError):
+    """Raised when an uploaded image cannot be used."""
+
+
+@dataclass(frozen=True)
+class TitleImage:
+    """A processed title image and the metadata H5P needs to reference it."""
+    path: str  # Relative to the content directory
+    data: bytes
+    mime: str
+    width: int
+    height: int
+
+
+def sniff_image_type(data: bytes) -> str:
+    """
+    Detects the image format from its leading bytes.
+
+    Returns:
+        str: The mime type.
+
+    Raises:
+        ImageError: If the data is not a PNG, JPEG, GIF or WebP image.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    raise ImageError("Unsupported title image format. Please upload a PNG, JPEG, GIF or WebP image.")
+
+
+def _png_size(data):
+    width, height = struct.unpack(">II", data[16:24])
+    return width, height
+
+
+def _encode(image, image_format):
+    out = io.BytesIO()
+    if image_format == "webp":
+        image.save(out, format="WEBP", quality=85, method=6)
+    else:
+        image.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def _process(data, size, scale, image_format):
+    mime = sniff_image_type(data)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:
+        # Without Pillow, keep the upload as it is but under its real type
+        logging.warning("Pillow is not installed; the title image is not optimized")
+        width, height = _png_size(data) if mime == "image/png" else size
+        return TitleImage(f"images/title-{digest}.{_EXTENSIONS[mime]}", data, mime, width, height)
+
+    if image_format == "webp" and not features.check("webp"):
+        image_format = "png"
+
+    try:
+        target = (size[0] * scale, size[1] * scale)
+        with Image.open(io.BytesIO(data)) as image:
+            # EXIF orientations 5-8 store the picture on its side
+            stored = target[::-1] if image.getexif().get(0x0112, 1) > 4 else target
+            image.draft("RGB", stored)  # Lets JPEG decode at reduced resolution
+            image.load()
+            # The re-encode drops EXIF, so bake the camera orientation into the pixels
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA")
+            # Render at ``scale`` times the displayed size so it stays sharp on high-DPI screens
+            image.thumbnail(target, Image.LANCZOS)
+            encoded = _encode(image, image_format)
+            width, height = image.size
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageError(f"Title image could not be read: {e}") from e
+
+    out_mime = f"image/{image_format}"
+    # Keep an upload that already has the target type and size and is smaller than the re-encode
+    if mime == out_mime == "image/png" and _png_size(data) == (width, height) and len(data) <= len(encoded):
+        encoded = data
+    return TitleImage(f"images/title-{digest}.{_EXTENSIONS[out_mime]}", encoded, out_mime, width, height)
+
+
+class ImageCache:
+    """Thread-safe LRU cache of processed images, keyed by content hash and options."""
+
+    def __init__(self, max_entries=_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_or_create(self, data, size, scale, image_format):
+        key = (hashlib.sha256(data).digest(), size, scale, image_format)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                return image
+
+        image = _process(data, size, scale, image_format)
+        with self._lock:
+            self._entries[key] = image
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return image
+
+
+_cache = ImageCache()
+
+
+def prepare_title_image(data: bytes, size=(52, 52), scale=2, image_format="png") -> TitleImage:
+    """
+    Validates, downscales and re-encodes an uploaded title image.
+
+    The image is fitted into ``size`` times ``scale`` pixels, keeping its
+    aspect ratio, and never upscaled. Results are cached by content hash, so
+    a logo reused across quizzes is processed once per process.
+
+    Args:
+        data (bytes): The uploaded file.
+        size (tuple[int, int]): Displayed width and height in CSS pixels.
+        scale (int): Pixel density of the rendered image (2 for retina screens).
+        image_format (str): "png" or "webp"; WebP falls back to PNG if
+            Pillow was built without WebP support.
+
+    Returns:
+        TitleImage: The processed image with its real width, height and mime.
+
+    Raises:
+        ImageError: If the data is not a supported image.
+    """
+    if image_format not in ("png", "webp"):
+        raise ValueError(f"Unsupported output format '{image_format}'")
+    return _cache.get_or_create(data, tuple(size), scale, image_format)
@@ -0,0 +1,218 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from h5p_zip import read_member, read_zip_index
+
+CONTENT_JSON = "content/content.json"
+H5P_JSON = "h5p.json"
+
+# Feedback is stored wrapped as "<div>feedback</div>\n" (see h5p_core._map_answer)
+_FEEDBACK_WRAPPER = re.compile(r"^<div>(.*)</div>\n?$", re.DOTALL)
+
+
+class PackageImportError(ValueError):
+    """Raised when a file is not an H5P package that can be imported."""
+
+
+def _unwrap_feedback(html):
+    match = _FEEDBACK_WRAPPER.match(html or "")
+    return match.group(1) if match else (html or "")
+
+
+def _library_nodes(node):
+    """Yields every ``{"library": ..., "params": ...}`` object in document order."""
+    if isinstance(node, dict):
+        if isinstance(node.get("library"), str) and isinstance(node.get("params"), dict):
+            yield node
+        for value in node.values():
+            yield from _library_nodes(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _library_nodes(value)
+
+
+def _import_multiple_choice(params):
+    return {
+        "type": "MultipleChoice",
+        "question": params.get("question", ""),
+        "options": [
+            {
+                "text": answer.get("text", ""),
+                "is_correct": bool(answer.get("correct", False)),
+                "feedback": _unwrap_feedback(answer.get("tipsAndFeedback", {}).get("chosenFeedback")),
+            }
+            for answer in params.get("answers", [])
+        ],
+    }
+
+
+def _import_true_false(params):
+    behaviour = params.get("behaviour", {})
+    return {
+        "type": "TrueFalse",
+        "question": params.get("question", ""),
+        "correct_answer": params.get("correct") == "true",
+        "feedback_correct": behaviour.get("feedbackOnCorrect", ""),
+        "feedback_incorrect": behaviour.get("feedbackOnWrong", ""),
+    }
+
+
+_IMPORTERS = {"H5P.MultiChoice": _import_multiple_choice, "H5P.TrueFalse": _import_true_false}
+
+
+def content_to_spec(content, h5p_info=None):
+    """
+    Converts a parsed content.json back into a quiz spec.
+
+    The spec has the keys read by h5p_batch.load_specs (``questions`` inline),
+    so imported packages can be rebuilt with the batch generator. A package
+    with several question sets (see h5p_series) becomes a series spec instead:
+    a ``sections`` list in the format read by h5p_series.load_sections, each
+    section with the media item in front of its question set. Questions of
+    other libraries are listed under ``skipped`` by library name.
+
+    Args:
+        content (dict): The parsed content.json.
+        h5p_info (dict, optional): The parsed h5p.json, for the title.
+
+    Returns:
+        dict: The quiz or series spec.
+    """
+    title = (h5p_info or {}).get("title", "")
+    sections, skipped = [], []
+    media, loose = {}, []  # The media item waiting for its question set; questions outside any set
+    for node in _library_nodes(content):
+        name = node["library"].split(" ")[0]
+        params = node["params"]
+        if name in _IMPORTERS:
+            (sections[-1]["questions"] if sections else loose).append(_IMPORTERS[name](params))
+        elif name == "H5P.Video" and not media:
+            sources = params.get("sources") or [{}]
+            media = {"media_type": "video", "media_url": sources[0].get("path", "")}
+        elif name == "H5P.Audio" and not media:
+            files = params.get("files") or [{}]
+            media = {"media_type": "audio", "media_url": files[0].get("path", "")}
+        elif name == "H5P.QuestionSet":
+            section = dict(media, title=params.get("introPage", {}).get("title") or title, questions=[])
+            for key, setting in (("randomization", "randomQuestions"), ("pool_size", "poolSize"),
+                                 ("pass_percentage", "passPercentage")):
+                if setting in params:
+                    section[key] = params[setting]
+            sections.append(section)
+            media = {}
+        elif name not in ("H5P.Column", "H5P.AdvancedText"):
+            skipped.append(name)
+
+    if len(sections) > 1:
+        spec = {"title": title, "sections": sections}
+        if loose:
+            sections[0]["questions"][:0] = loose
+    else:
+        spec = dict(media, title=title)
+        if sections:
+            spec.update(sections[0])
+        spec["questions"] = loose + spec.get("questions", [])
+    if skipped:
+        spec["skipped"] = skipped
+    return spec
+
+
+def import_package(path) -> dict:
+    """
+    Reads the questions and settings back from an .h5p package.
+
+    Only the central directory, ``h5p.json`` and ``content/content.json`` are
+    read; library members are never inflated, and the file is memory-mapped
+    so their bytes are not even loaded.
+
+    Returns:
+        dict: The quiz or series spec (see content_to_spec).
+
+    Raises:
+        PackageImportError: If the file is not a readable H5P package.
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            members = {member.filename: member for member in read_zip_index(view)}
+            content = json.loads(read_member(view, members[CONTENT_JSON])) if CONTENT_JSON in members else None
+            h5p_info = json.loads(read_member(view, members[H5P_JSON])) if H5P_JSON in members else None
+    except (OSError, ValueError, struct.error, zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError) as e:
+        raise PackageImportError(f"{path}: {e}") from e
+    if content is None:
+        raise PackageImportError(f"{path}: no {CONTENT_JSON}")
+    return content_to_spec(content, h5p_info)
+
+
+def _import_one(path):
+    try:
+        return path, import_package(path), None
+    except PackageImportError as e:
+        return path, None, str(e)
+
+
+def scan_directory(directory, workers=None, pattern="**/*.h5p"):
+    """
+    Imports every package below ``directory`` in a process pool.
+
+    Args:
+        directory (str or Path): Where to look for packages.
+        workers (int, optional): Worker processes (default: CPU count).
+        pattern (str): Glob pattern of the packages, relative to ``directory``.
+
+    Yields:
+        tuple[Path, dict or None, str or None]: The package path, its spec, and
+        an error message if it could not be imported, in path order.
+    """
+    paths = sorted(Path(directory).glob(pattern))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < 2:
+        yield from map(_import_one, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Packages are small jobs; batching them keeps the IPC overhead down
+        yield from pool.map(_import_one, paths, chunksize=max(1, min(64, len(paths) // (workers * 4))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read questions and settings back from H5P packages.")
+    parser.add_argument("source", help="An .h5p package or a directory to scan for packages")
+    parser.add_argument("--output", default=None, help="JSONL file for the specs (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    source = Path(args.source)
+    results = scan_directory(source, args.workers) if source.is_dir() else [_import_one(source)]
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    imported, failures = 0, 0
+    try:
+        for path, spec, error in results:
+            if error:
+                failures += 1
+                print(f"  {error}", file=sys.stderr)
+                continue
+            imported += 1
+            # One spec per line, in the format h5p_batch reads back; series
+            # packages give series specs (see h5p_series.load_sections)
+            spec_id = "-".join(path.relative_to(source).with_suffix("").parts) if source.is_dir() else path.stem
+            spec = dict(spec, id=spec_id)
+            out.write(json.dumps(spec, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{imported} imported, {failures} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import argparse
+import json
+import re
+import sys
+import threading
+from dataclasses import dataclass
+
+from h5p_templates import get_template
+from h5p_zip import read_member
+
+# Library references inside content.json, e.g. "library": "H5P.MultiChoice 1.16"
+_LIBRARY_REFERENCE = re.compile(r'"library": ?"([\w.-]+) (\d+)\.(\d+)"')
+
+
+class MissingLibraryError(LookupError):
+    """Raised when a required library is not available in the template."""
+
+
+@dataclass(frozen=True)
+class Library:
+    """An H5P library shipped in a template, as described by its library.json."""
+    machine_name: str
+    major_version: int
+    minor_version: int
+    patch_version: int
+    directory: str
+    preloaded_dependencies: tuple
+    editor_dependencies: tuple
+
+    @property
+    def key(self):
+        return self.machine_name, self.major_version, self.minor_version
+
+
+def _dependency_keys(dependencies):
+    return tuple((d["machineName"], d["majorVersion"], d["minorVersion"]) for d in dependencies)
+
+
+def content_libraries(content_json: str) -> list:
+    """
+    Lists the libraries referenced by a serialized content.json, in order of first use.
+
+    Returns:
+        list[tuple[str, int, int]]: (machine name, major version, minor version) keys.
+    """
+    found = dict.fromkeys(
+        (name, int(major), int(minor)) for name, major, minor in _LIBRARY_REFERENCE.findall(content_json)
+    )
+    return list(found)
+
+
+def dependency_list(libraries) -> list:
+    """Formats libraries as an h5p.json ``preloadedDependencies`` list."""
+    return [
+        {"machineName": lib.machine_name, "majorVersion": lib.major_version, "minorVersion": lib.minor_version}
+        for lib in libraries
+    ]
+
+
+def library_manifest(libraries) -> list:
+    """
+    Describes libraries as a manifest of installed versions.
+
+    The format is a JSON list of ``{"machineName", "majorVersion",
+    "minorVersion", "patchVersion"}`` objects, as accepted by load_manifest.
+    """
+    return [dict(entry, patchVersion=lib.patch_version) for entry, lib in zip(dependency_list(libraries), libraries)]
+
+
+def manifest_versions(entries) -> dict:
+    """
+    Indexes parsed manifest entries (see library_manifest).
+
+    Returns:
+        dict: Installed patch versions keyed by (machine name, major, minor).
+    """
+    return {
+        (entry["machineName"], entry["majorVersion"], entry["minorVersion"]): entry.get("patchVersion", 0)
+        for entry in entries
+    }
+
+
+def load_manifest(path) -> dict:
+    """
+    Loads a manifest of the library versions installed on an H5P host.
+
+    Args:
+        path (str or Path): JSON file in the format written by library_manifest.
+
+    Returns:
+        dict: Installed patch versions keyed by (machine name, major, minor).
+    """
+    with open(path, encoding="utf-8") as f:
+        return manifest_versions(json.load(f))
+
+
+def check_installed(libraries, installed: dict):
+    """
+    Checks that a host has every library a content-only package depends on.
+
+    Args:
+        libraries (list[Library]): The libraries the content needs.
+        installed (dict): Installed patch versions, as returned by load_manifest.
+
+    Returns:
+        tuple[list, list]: Libraries missing on the host, and libraries whose
+        installed patch version is older than the template's.
+    """
+    missing = [lib for lib in libraries if lib.key not in installed]
+    outdated = [lib for lib in libraries if lib.key in installed and installed[lib.key] < lib.patch_version]
+    return missing, outdated
+
+
+class LibraryGraph:
+    """
+    The dependency graph of the libraries in a template archive.
+
+    Built once per template from every ``<directory>/library.json``. Archive
+    members are grouped by their top-level directory so a package can copy
+    exactly the libraries it needs; duplicate member names are dropped, as is
+    the template's own ``content/`` directory, which generated packages replace.
+    """
+
+    def __init__(self, template):
+        self._libraries = {}
+        self._members = {}
+        self._other_members = []
+
+        seen = set()
+        for member in template.members:
+            if member.filename in seen:
+                continue
+            seen.add(member.filename)
+
+            directory, _, rest = member.filename.partition("/")
+            if directory == "content":
+                continue
+            if rest == "library.json":
+                info = json.loads(read_member(template.data, member))
+                library = Library(
+                    machine_name=info["machineName"],
+                    major_version=info["majorVersion"],
+                    minor_version=info["minorVersion"],
+                    patch_version=info.get("patchVersion", 0),
+                    directory=directory,
+                    preloaded_dependencies=_dependency_keys(info.get("preloadedDependencies", [])),
+                    editor_dependencies=_dependency_keys(info.get("editorDependencies", [])),
+                )
+                self._libraries[library.key] = library
+            self._members.setdefault(directory, []).append(member)
+
+        library_dirs = {lib.directory for lib in self._libraries.values()}
+        for directory in list(self._members):
+            if directory not in library_dirs:
+                self._other_members.extend(self._members.pop(directory))
+
+    @property
+    def libraries(self):
+        """All libraries in the template, keyed by (machine name, major, minor)."""
+        return dict(self._libraries)
+
+    def resolve(self, roots, include_editor=True) -> list:
+        """
+        Returns every library reachable from ``roots``, dependencies first.
+
+        Args:
+            roots (iterable): Library keys the content uses directly.
+            include_editor (bool): Also follow ``editorDependencies``. Editor
+                libraries missing from the template are skipped.
+
+        Returns:
+            list[Library]: The resolved libraries in dependency order.
+
+        Raises:
+            MissingLibraryError: If a runtime dependency is not in the template.
+        """
+        resolved = {}
+        visiting = set()
+
+        def visit(key, required):
+            if key in resolved or key in visiting:
+                return
+            library = self._libraries.get(key)
+            if library is None:
+                if required:
+                    raise MissingLibraryError(f"Library {key[0]} {key[1]}.{key[2]} is not in the template")
+                return
+            visiting.add(key)
+            for dependency in library.preloaded_dependencies:
+                visit(dependency, required)
+            if include_editor:
+                for dependency in library.editor_dependencies:
+                    visit(dependency, False)
+            visiting.discard(key)
+            resolved[key] = library
+
+        for root in roots:
+            visit(root, True)
+        return list(resolved.values())
+
+    def members(self, libraries) -> list:
+        """Returns the archive members of ``libraries`` plus all non-library members."""
+        selected = list(self._other_members)
+        for library in libraries:
+            selected.extend(self._members.get(library.directory, ()))
+        return selected
+
+
+_lock = threading.Lock()
+_graphs = {}
+
+
+def get_library_graph(template) -> LibraryGraph:
+    """Returns the dependency graph of a template, building it once per template version."""
+    with _lock:
+        graph = _graphs.get(template.sha256)
+        if graph is None:
+            graph = _graphs[template.sha256] = LibraryGraph(template)
+        return graph
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the library manifest of an H5P template or package.")
+    parser.add_argument("archive", help="Template ZIP or .h5p file")
+    args = parser.parse_args(argv)
+
+    graph = get_library_graph(get_template(args.archive))
+    libraries = sorted(graph.libraries.values(), key=lambda lib: lib.key)
+    json.dump(library_manifest(libraries), sys.stdout, indent=4)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from h5p_zip import CHUNK_SIZE
+
+# Bytes needed to identify every supported container
+_HEADER_SIZE = 64
+
+# Content directories of embedded media, as used by the H5P editor
+_DIRECTORIES = {"video": "videos", "audio": "audio"}
+
+
+class MediaError(ValueError):
+    """Raised when a local media file cannot be embedded."""
+
+
+@dataclass(frozen=True)
+class EmbeddedMedia:
+    """A local audio or video file to be stored in a package."""
+    path: str  # Relative to the content directory
+    source: str  # The file on disk
+    mime: str
+    size: int
+    crc: int
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """Yields the file content in chunks of ``chunk_size`` bytes."""
+        with open(self.source, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+
+def sniff_media_type(header: bytes, media_type: str):
+    """
+    Detects the format of a media file from its leading bytes.
+
+    Containers that hold both audio and video (MP4, WebM, Ogg) get the mime
+    type matching ``media_type``. WebM and Ogg keep their container extension
+    for both, since H5P hosts only whitelist ``webm`` and ``ogg``.
+
+    Args:
+        header (bytes): At least the first 64 bytes of the file.
+        media_type (str): "video" or "audio".
+
+    Returns:
+        tuple[str, str]: The mime type and the file extension.
+
+    Raises:
+        MediaError: If the format is not supported for ``media_type``.
+    """
+    video = media_type == "video"
+    if header[4:8] == b"ftyp":
+        if header[8:12] in (b"M4A ", b"M4B "):
+            formats = {"audio": ("audio/mp4", "m4a")}
+        else:
+            formats = {"video": ("video/mp4", "mp4"), "audio": ("audio/mp4", "m4a")}
+    elif header.startswith(b"\x1a\x45\xdf\xa3") and b"webm" in header:
+        formats = {"video": ("video/webm", "webm"), "audio": ("audio/webm", "webm")}
+    elif header.startswith(b"OggS"):
+        formats = {"video": ("video/ogg", "ogg"), "audio": ("audio/ogg", "ogg")}
+    elif header.startswith(b"ID3") or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        formats = {"audio": ("audio/mpeg", "mp3")}
+    elif header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        formats = {"audio": ("audio/wav", "wav")}
+    else:
+        formats = {}
+
+    if media_type not in formats:
+        supported = "MP4, WebM or Ogg" if video else "MP3, M4A, Ogg, WAV or WebM"
+        raise MediaError(f"Unsupported {media_type} file format. Please use an {supported} file.")
+    return formats[media_type]
+
+
+def prepare_media(path, media_type, chunk_size=CHUNK_SIZE) -> EmbeddedMedia:
+    """
+    Inspects a local media file for embedding.
+
+    Reads the file once, in chunks, to sniff its format and compute the size
+    and CRC-32 the ZIP headers need up front; the content itself is streamed
+    into the package later (see EmbeddedMedia.chunks).
+
+    Args:
+        path (str or Path): The audio or video file.
+        media_type (str): "video" or "audio".
+
+    Returns:
+        EmbeddedMedia: The file's metadata and its path inside the package.
+
+    Raises:
+        MediaError: If the file cannot be read or has an unsupported format.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER_SIZE)
+            mime, extension = sniff_media_type(header, media_type)
+            crc = zlib.crc32(header)
+            size = len(header)
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+    except OSError as e:
+        raise MediaError(f"Media file could not be read: {e}") from e
+
+    # Named by content, so re-embedding the same recording gives the same path
+    name = f"{_DIRECTORIES[media_type]}/{media_type}-{crc:08x}-{size:x}.{extension}"
+    return EmbeddedMedia(name, str(Path(path)), mime, size, crc)
@@ -0,0 +1,163 @@
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("h5p.metrics")
+
+# Upper bounds of the stage duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+_current_build = contextvars.ContextVar("h5p_current_build", default=None)
+
+
+@dataclass
+class BuildTrace:
+    """Stage timings and sizes recorded while building one package."""
+    stages: list = field(default_factory=list)  # (stage, seconds, fields) tuples
+    package: dict = field(default_factory=dict)
+
+    @property
+    def total_seconds(self):
+        return sum(seconds for _, seconds, _ in self.stages)
+
+
+class MetricsRegistry:
+    """Thread-safe, process-wide store of counters, gauges and stage histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}  # stage -> [bucket counts, sum, count]
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.setdefault(stage, [[0] * len(DURATION_BUCKETS), 0.0, 0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            if self._histograms:
+                lines.append("# HELP h5p_stage_duration_seconds Time spent per generation stage.")
+                lines.append("# TYPE h5p_stage_duration_seconds histogram")
+                for stage, (buckets, total, count) in sorted(self._histograms.items()):
+                    for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'h5p_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {bucket_count}')
+                    lines.append(f'h5p_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+                    lines.append(f'h5p_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE h5p_{name} counter")
+                lines.append(f"h5p_{name} {value}")
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f"# TYPE h5p_{name} gauge")
+                lines.append(f"h5p_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
+
+
+def record_stage(stage, seconds, **fields):
+    """
+    Records the duration of a generation stage.
+
+    The duration goes into the process-wide histogram, into the current
+    BuildTrace (see collect) and into a DEBUG log record whose ``metric``
+    attribute carries the structured values.
+    """
+    registry.observe_stage(stage, seconds)
+    build = _current_build.get()
+    if build is not None:
+        build.stages.append((stage, seconds, fields))
+    logger.debug(f"Stage {stage} took {seconds * 1000:.2f} ms", extra={"metric": dict(fields, stage=stage, seconds=seconds)})
+
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    """Times the enclosed block as generation stage ``name``."""
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record_stage(name, time.perf_counter() - start, **fields)
+
+
+def count(name, value=1):
+    """Adds ``value`` to the process-wide counter ``name``."""
+    registry.count(name, value)
+
+
+def record_package(bytes_in, bytes_out):
+    """
+    Records the size of a finished package.
+
+    Args:
+        bytes_in (int): Uncompressed size of all members.
+        bytes_out (int): Size of the archive.
+    """
+    ratio = bytes_out / bytes_in if bytes_in else 1.0
+    registry.count("packages_total")
+    registry.count("package_bytes_in_total", bytes_in)
+    registry.count("package_bytes_out_total", bytes_out)
+    registry.set_gauge("last_package_compression_ratio", round(ratio, 4))
+
+    values = {"bytes_in": bytes_in, "bytes_out": bytes_out, "compression_ratio": ratio}
+    build = _current_build.get()
+    if build is not None:
+        build.package = values
+        values = dict(values, stages={name: seconds for name, seconds, _ in build.stages})
+    logger.info(f"Built package of {bytes_out} bytes ({ratio:.1%} of {bytes_in} bytes)", extra={"metric": values})
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collects the stages and package sizes recorded in the enclosed block.
+
+    Yields:
+        BuildTrace: Filled in as the build progresses.
+    """
+    build = BuildTrace()
+    token = _current_build.set(build)
+    try:
+        yield build
+    finally:
+        _current_build.reset(token)
+
+
+def render_prometheus() -> str:
+    """Renders the process-wide metrics in the Prometheus text format."""
+    return registry.render_prometheus()
+
+
+def write_prometheus(path):
+    """Writes the metrics to ``path`` atomically, e.g. for node_exporter's textfile collector."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
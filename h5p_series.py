@@ -0,0 +1,231 @@
+import argparse
+import io
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import h5p_metrics
+from h5p_batch import read_spec_inputs
+from h5p_cache import package_key
+from h5p_compression import PROFILES, template_source
+from h5p_core import (
+    DEFAULT_TEMPLATE, FIXED_DATE_TIME, GenerationError, create_full_content_structure, deterministic_uuids,
+    generate_uuid, h5p_json, load_media, load_title_image, prepare_questions, resolve_compression, select_libraries
+)
+from h5p_fragments import dumps
+from h5p_libraries import content_libraries, load_manifest
+from h5p_templates import get_template
+from h5p_text import DEFAULT_NORMALIZER
+from h5p_zip import PackageWriter
+
+
+@dataclass(frozen=True)
+class Section:
+    """One media item with its question set in a series package."""
+    media_url: str
+    media_type: str
+    json_data: dict
+    title: str
+    randomization: bool = True
+    pool_size: int = 7
+    pass_percentage: int = 75
+    media_file: str = None  # Local audio or video file, embedded instead of media_url
+
+
+def _render_section(index, section, series_title, title_image, messages, deterministic, language, normalizer):
+    """Returns the serialized column items of one section and its embedded media, if any."""
+    media = load_media(section.media_file, section.media_type)
+    id_factory = generate_uuid
+    if deterministic:
+        id_factory = deterministic_uuids(package_key(
+            series=series_title, index=index, json_data=section.json_data, media_url=section.media_url,
+            media_type=section.media_type, title=section.title, language=language, normalizer=normalizer.key,
+            media=(media.mime, media.size, media.crc) if media else None
+        ))
+
+    questions = prepare_questions(section.json_data, messages, deterministic, language, normalizer, id_factory=id_factory)
+    if not questions:
+        raise GenerationError(f"Section {index + 1}: No valid questions found in the JSON.")
+    with h5p_metrics.stage("structure", media_type=section.media_type, section=index):
+        content = create_full_content_structure(
+            questions, section.media_url, section.media_type, normalizer(section.title), section.randomization,
+            section.pool_size, section.pass_percentage, messages, id_factory=id_factory,
+            background_image=title_image, media=media
+        )
+    with h5p_metrics.stage("serialization", section=index) as fields:
+        # The items of the section, without the brackets of their list
+        text = dumps(content["content"])[1:-1]
+        fields["chars"] = len(text)
+    return text, media
+
+
+def _content_chunks(sections, series_title, title_image, messages, deterministic, language, normalizer, used_libraries,
+                    embedded):
+    """
+    Yields content.json in pieces of one section each, building each section only when it is needed.
+
+    Collects the libraries the sections use into ``used_libraries`` and their
+    embedded media into ``embedded``.
+    """
+    yield b'{"content": ['
+    count = 0
+    for index, section in enumerate(sections):
+        text, media = _render_section(index, section, series_title, title_image, messages, deterministic, language,
+                                      normalizer)
+        used_libraries.update(dict.fromkeys(content_libraries(text)))
+        if media:
+            embedded.setdefault(media.path, media)
+        yield ((", " if count else "") + text).encode("utf-8")
+        count += 1
+    if not count:
+        raise GenerationError("The series has no sections.")
+    yield b"]}"
+
+
+def create_series_package(sections, template_path, title, user_image=None, sink=None, messages=None, deterministic=False,
+                          language="de", include_editor=True, installed_libraries=None, image_format="png",
+                          normalizer=DEFAULT_NORMALIZER, compression=None):
+    """
+    Builds one H5P.Column package holding a whole series of media items with their quizzes.
+
+    Every section adds an intro text, its video or audio, and its question
+    set to the column, so the libraries are shipped once per series instead
+    of once per media item. ``sections`` may be any iterable, e.g. a generator
+    reading them from disk: each section is mapped and serialized only when
+    it is written, and content.json is deflated as it is produced (see
+    PackageWriter.write_stream), so the whole content tree is never in memory.
+    The library members follow content.json, once its libraries are known.
+
+    Args:
+        sections (iterable[Section]): The sections, in order.
+        title (str): Title of the package.
+        user_image (bytes, optional): Title image shown on every quiz intro page.
+        Other arguments are as for process_input.
+
+    Returns:
+        bytes or None: The .h5p package, or None when it was written to ``sink``.
+
+    Raises:
+        GenerationError: If the package cannot be generated from the input.
+    """
+    try:
+        policy = resolve_compression(compression)
+        title = normalizer(title)
+        title_image = load_title_image(user_image, image_format)
+        date_time = FIXED_DATE_TIME if deterministic else None
+        output = io.BytesIO() if sink is None else sink
+        writer = PackageWriter(output)
+        used_libraries, embedded = {}, {}
+
+        chunks = _content_chunks(sections, title, title_image, messages, deterministic, language, normalizer,
+                                 used_libraries, embedded)
+        for _ in writer.write_stream("content/content.json", chunks, date_time=date_time, level=policy.level):
+            pass
+
+        start = time.perf_counter()
+        generated = writer.size
+        for media in embedded.values():
+            for _ in writer.write_chunks(f"content/{media.path}", media.chunks(), media.size, media.crc, date_time):
+                pass
+        if title_image:
+            policy.write(writer, f"content/{title_image.path}", title_image.data, date_time)
+        h5p_metrics.record_stage("media_copy", time.perf_counter() - start, bytes_out=writer.size - generated)
+
+        start = time.perf_counter()
+        copied = writer.size
+        template = get_template(template_path)
+        members, runtime_libraries = select_libraries(template, list(used_libraries), include_editor, installed_libraries)
+        source, members = template_source(template, members, policy)
+        for member in members:
+            writer.copy(member, source)
+        h5p_metrics.record_stage("template_copy", time.perf_counter() - start, members=len(members),
+                                 bytes_out=writer.size - copied)
+
+        start = time.perf_counter()
+        copied = writer.size
+        policy.write(writer, "h5p.json", h5p_json(title, runtime_libraries), date_time)
+        writer.close()
+        h5p_metrics.record_stage("zip_finalize", time.perf_counter() - start, bytes_out=writer.size - copied)
+        h5p_metrics.record_package(writer.uncompressed_size, writer.size)
+        return output.getvalue() if sink is None else None
+    except GenerationError:
+        raise
+    except Exception as e:
+        raise GenerationError(f"Processing error: {e}") from e
+
+
+def load_sections(spec, base_dir):
+    """
+    Yields the sections of a series spec, reading each one's questions only when it is reached.
+
+    The spec is a JSON object with a ``sections`` list. Each section has the
+    keys of a h5p_batch spec (``media_url``, ``media_type``, ``questions``,
+    ``title``, ``randomization``, ``pool_size``, ``pass_percentage``,
+    ``media_file``); ``randomization``, ``pool_size`` and
+    ``pass_percentage`` default to the series-level values.
+    """
+    defaults = {key: spec[key] for key in ("randomization", "pool_size", "pass_percentage") if key in spec}
+    for index, entry in enumerate(spec["sections"]):
+        entry = dict(defaults, **entry)
+        json_data, _ = read_spec_inputs(entry, base_dir)
+        yield Section(
+            media_url=entry.get("media_url", ""),
+            media_type=entry.get("media_type", "video"),
+            json_data=json_data,
+            title=entry.get("title", f"Teil {index + 1}"),
+            randomization=entry.get("randomization", True),
+            pool_size=entry.get("pool_size", 7),
+            pass_percentage=entry.get("pass_percentage", 75),
+            media_file=base_dir / entry["media_file"] if entry.get("media_file") else None,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build one H5P package from a series of media items and quizzes.")
+    parser.add_argument("spec", help="Series spec JSON with a 'sections' list")
+    parser.add_argument("output", help="The .h5p file to write")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Template ZIP archive")
+    parser.add_argument("--deterministic", action="store_true", help="Produce identical packages for identical inputs")
+    parser.add_argument("--manifest", default=None,
+                        help="Write a content-only package for a host with the libraries in this manifest")
+    parser.add_argument("--compression", choices=list(PROFILES), default="balanced", help="Compression profile")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    spec_path = Path(args.spec)
+    with open(spec_path, encoding="utf-8") as f:
+        spec = json.load(f)
+    image_bytes = (spec_path.parent / spec["image"]).read_bytes() if spec.get("image") else None
+
+    output = Path(args.output)
+    tmp_path = output.with_name(output.name + ".part")
+    try:
+        with open(tmp_path, "wb") as f:
+            create_series_package(
+                load_sections(spec, spec_path.parent),
+                template_path=Path(args.template).resolve(),
+                title=spec.get("title", "Video Quiz"),
+                user_image=image_bytes,
+                sink=f,
+                deterministic=args.deterministic,
+                include_editor=spec.get("include_editor", True),
+                installed_libraries=load_manifest(args.manifest) if args.manifest else None,
+                compression=args.compression
+            )
+    except GenerationError as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(output)
+    print(f"Series written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import quote
+
+import h5p_metrics
+from h5p_cache import PackageCache
+from h5p_core import DEFAULT_TEMPLATE, GenerationError, process_input
+from h5p_libraries import load_manifest
+from h5p_zip import CHUNK_SIZE
+
+MAX_BODY_SIZE = 16 * 1024 * 1024
+HEADER_TIMEOUT = 10
+MAX_HEADERS = 100
+
+# Warnings and errors listed in the X-H5P-Messages header, and the longest text
+# kept per message; X-H5P-Message-Count has the total, so large banks don't
+# produce headers that clients and proxies reject
+MAX_HEADER_MESSAGES = 20
+MAX_HEADER_MESSAGE_LENGTH = 200
+
+# Characters that may not appear in a download name: controls, quotes and path separators
+_UNSAFE_NAME = re.compile(r'[\x00-\x1f\x7f"\\/]')
+
+
+class HTTPError(Exception):
+    """Aborts a request with an HTTP error status."""
+
+    def __init__(self, status, message=None, headers=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.headers = headers or {}
+
+
+def download_name(output):
+    """
+    Reduces a client-supplied file name to a safe basename for Content-Disposition.
+
+    Raises:
+        HTTPError: 400 if the name is not a string or nothing usable remains.
+    """
+    if output is None:
+        return "quiz.h5p"
+    if not isinstance(output, str):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'output' must be a string")
+    name = re.split(r"[\\/]", output)[-1]
+    name = _UNSAFE_NAME.sub("", name).strip().lstrip(".")
+    if not name:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'output' is not a usable file name")
+    return name
+
+
+def content_disposition(name):
+    """Returns a Content-Disposition header value; non-ASCII names are sent as RFC 5987 ``filename*``."""
+    if name.isascii():
+        return f'attachment; filename="{name}"'
+    fallback = name.encode("ascii", "replace").decode("ascii").replace("?", "_")
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(name, safe='')}"
+
+
+def build_package(spec, template_path, cache_dir=None, installed_libraries=None):
+    """
+    Builds a package from a request spec.
+
+    Runs inside a worker process. The spec has the same keys as a batch spec
+    (see h5p_batch.load_specs), except that ``questions`` must be inline and
+    ``image`` is the base64-encoded title image. ``deterministic``,
+    ``language``, ``image_format`` and ``compression`` are passed through to
+    process_input.
+
+    Returns:
+        tuple: The package bytes, the Message entries, and the BuildTrace.
+
+    Raises:
+        GenerationError: If no package can be generated from the spec.
+    """
+    questions = spec.get("questions")
+    if isinstance(questions, list):
+        questions = {"questions": questions}
+    if not isinstance(questions, dict):
+        raise GenerationError("'questions' must be a questions JSON object or a list of questions.")
+
+    image_bytes = None
+    if spec.get("image"):
+        try:
+            image_bytes = base64.b64decode(spec["image"], validate=True)
+        except (binascii.Error, TypeError) as e:
+            raise GenerationError(f"'image' is not valid base64: {e}") from e
+
+    messages = []
+    with h5p_metrics.collect() as build:
+        package = process_input(
+            media_url=spec.get("media_url", ""),
+            media_type=spec.get("media_type", "video"),
+            json_data=questions,
+            template_path=template_path,
+            title=spec.get("title", "Video Quiz"),
+            randomization=spec.get("randomization", True),
+            pool_size=spec.get("pool_size", 7),
+            pass_percentage=spec.get("pass_percentage", 75),
+            user_image=image_bytes,
+            messages=messages,
+            deterministic=spec.get("deterministic", False),
+            # Disk-only: each worker process would otherwise hold its own copy
+            cache=PackageCache(max_bytes=0, directory=cache_dir) if cache_dir else None,
+            language=spec.get("language", "de"),
+            compression=spec.get("compression"),
+            include_editor=spec.get("include_editor", True),
+            installed_libraries=installed_libraries,
+            image_format=spec.get("image_format", "png")
+        )
+    return package, messages, build
+
+
+class GenerationServer:
+    """
+    An HTTP front end that builds packages in a pool of worker processes.
+
+    Requests are parsed on the event loop, packaging runs in the pool. At
+    most ``workers + queue_size`` packages are admitted at once; further
+    requests are answered with 429 right away instead of queueing without
+    bound. A request that takes longer than ``timeout`` seconds gets a 504,
+    but keeps its admission slot until its worker has actually finished.
+
+    Endpoints:
+        POST /packages: Builds a package from a JSON spec (see build_package)
+            and streams it back as ``application/zip``. The first warnings
+            and errors are listed in ``X-H5P-Messages``, their number in
+            ``X-H5P-Message-Count``.
+        GET /metrics: Metrics in the Prometheus text format.
+        GET /health: Returns ``ok``.
+    """
+
+    def __init__(self, template_path=DEFAULT_TEMPLATE, workers=None, queue_size=None, timeout=60, cache_dir=None,
+                 installed_libraries=None, max_body_size=MAX_BODY_SIZE):
+        self.template_path = template_path
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + (self.workers * 2 if queue_size is None else queue_size)
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.installed_libraries = installed_libraries
+        self.max_body_size = max_body_size
+        self._in_flight = 0
+        self._pool = None
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        """Serves requests until cancelled."""
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            logging.info(f"Serving on http://{host}:{port} with {self.workers} workers")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            try:
+                method, path, headers = await asyncio.wait_for(self._read_head(reader), HEADER_TIMEOUT)
+                await self._dispatch(method, path, headers, reader, writer)
+            except HTTPError as e:
+                await self._send_json(writer, e.status, {"error": str(e)}, e.headers)
+            except asyncio.TimeoutError:
+                await self._send_json(writer, HTTPStatus.REQUEST_TIMEOUT, {"error": "Request headers not received in time"})
+            await writer.drain()
+        except ConnectionError:
+            pass
+        except Exception:
+            logging.exception("Unhandled error while serving a request")
+        finally:
+            writer.close()
+
+    async def _read_head(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        parts = request_line.split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        for _ in range(MAX_HEADERS):
+            line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                return parts[0], parts[1].split("?", 1)[0], headers
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+    async def _dispatch(self, method, path, headers, reader, writer):
+        h5p_metrics.count("http_requests_total")
+        if path == "/health" and method == "GET":
+            self._send_head(writer, HTTPStatus.OK, {"Content-Type": "text/plain", "Content-Length": "2"})
+            writer.write(b"ok")
+        elif path == "/metrics" and method == "GET":
+            h5p_metrics.registry.set_gauge("http_in_flight", self._in_flight)
+            body = h5p_metrics.render_prometheus().encode("utf-8")
+            self._send_head(writer, HTTPStatus.OK, {
+                "Content-Type": "text/plain; version=0.0.4; charset=utf-8", "Content-Length": str(len(body))
+            })
+            writer.write(body)
+        elif path == "/packages":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, headers={"Allow": "POST"})
+            await self._generate(headers, reader, writer)
+        else:
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def _generate(self, headers, reader, writer):
+        # Admission control comes first, so a saturated server doesn't even read the body.
+        # The slot is taken right away; otherwise requests whose bodies are still
+        # arriving would all pass the check
+        if self._in_flight >= self.capacity:
+            h5p_metrics.count("http_rejected_total")
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "Server is busy, try again later", {"Retry-After": "1"})
+        self._in_flight += 1
+        try:
+            spec, filename = await self._read_spec(headers, reader)
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool, build_package, spec, self.template_path, self.cache_dir, self.installed_libraries
+            )
+        except BaseException:
+            self._in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            # shield: a timed-out build keeps running, and keeps its slot, until the worker is done
+            package, messages, build = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            h5p_metrics.count("http_timeouts_total")
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, f"Package generation took longer than {self.timeout} s") from None
+        except GenerationError as e:
+            h5p_metrics.count("http_failures_total")
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e)) from None
+        except Exception as e:
+            h5p_metrics.count("http_failures_total")
+            logging.error(f"Package generation failed: {e}")
+            raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, "Package generation failed") from None
+
+        # Workers have their own registries; replay the build's metrics in this process
+        for stage, seconds, fields in build.stages:
+            h5p_metrics.record_stage(stage, seconds, **fields)
+        if build.package:
+            h5p_metrics.record_package(build.package["bytes_in"], build.package["bytes_out"])
+
+        notices = [m.text for m in messages if m.level != "info"]
+        self._send_head(writer, HTTPStatus.OK, {
+            "Content-Type": "application/zip",
+            "Content-Length": str(len(package)),
+            "Content-Disposition": content_disposition(filename),
+            "X-H5P-Messages": json.dumps(
+                [text[:MAX_HEADER_MESSAGE_LENGTH] for text in notices[:MAX_HEADER_MESSAGES]], ensure_ascii=True
+            ),
+            "X-H5P-Message-Count": str(len(notices)),
+        })
+        view = memoryview(package)
+        for offset in range(0, len(view), CHUNK_SIZE):
+            writer.write(view[offset:offset + CHUNK_SIZE])
+            await writer.drain()
+
+    async def _read_spec(self, headers, reader):
+        """Reads and checks the JSON spec of a generation request; returns it with the download name."""
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED) from None
+        if length > self.max_body_size:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request body exceeds {self.max_body_size} bytes")
+        try:
+            spec = json.loads(await asyncio.wait_for(reader.readexactly(length), HEADER_TIMEOUT))
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Incomplete request body") from None
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}") from None
+        if not isinstance(spec, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "The request body must be a JSON object")
+        return spec, download_name(spec.get("output"))
+
+    def _release(self, future):
+        self._in_flight -= 1
+
+    def _send_head(self, writer, status, headers):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", "Connection: close"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _send_json(self, writer, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self._send_head(writer, status, dict(headers or {}, **{
+            "Content-Type": "application/json", "Content-Length": str(len(body))
+        }))
+        writer.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve H5P package generation over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Template ZIP archive")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="Requests waiting for a worker before new ones get 429 (default: 2 x workers)")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds before a request gets 504")
+    parser.add_argument("--max-body", type=int, default=MAX_BODY_SIZE, help="Largest accepted request body in bytes")
+    parser.add_argument("--cache-dir", default=None, help="Directory for the content-addressed package cache")
+    parser.add_argument("--manifest", default=None,
+                        help="Write content-only packages for a host with the libraries in this manifest")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = GenerationServer(
+        template_path=Path(args.template).resolve(), workers=args.workers, queue_size=args.queue_size,
+        timeout=args.timeout, cache_dir=args.cache_dir,
+        installed_libraries=load_manifest(args.manifest) if args.manifest else None, max_body_size=args.max_body
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
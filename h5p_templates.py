@@ -0,0 +1,80 @@
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass, replace
+
+from h5p_zip import read_zip_index
+
+
+@dataclass(frozen=True)
+class Template:
+    """A template archive loaded into memory together with its parsed member index."""
+    path: str
+    mtime_ns: int
+    size: int
+    sha256: str
+    data: bytes
+    members: tuple
+
+
+class TemplateRegistry:
+    """
+    Thread-safe, process-wide cache of template archives.
+
+    Each template is read and indexed once. A cheap ``stat`` on every lookup
+    detects changes to the file; when the mtime or size differs the file is
+    re-read, and the existing index is kept if its SHA-256 is unchanged.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+
+    def get(self, path) -> Template:
+        """
+        Returns the current version of the template at ``path``.
+
+        Args:
+            path (str or Path): Path to the template ZIP archive.
+
+        Returns:
+            Template: The cached or freshly loaded template.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._templates.get(path)
+            if cached and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+                return cached
+
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if cached and cached.sha256 == digest:
+                template = replace(cached, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            else:
+                logging.info(f"Loading template {path}")
+                template = Template(
+                    path=path,
+                    mtime_ns=stat.st_mtime_ns,
+                    size=stat.st_size,
+                    sha256=digest,
+                    data=data,
+                    members=tuple(read_zip_index(data)),
+                )
+            self._templates[path] = template
+            return template
+
+    def clear(self):
+        """Drops all cached templates."""
+        with self._lock:
+            self._templates.clear()
+
+
+_registry = TemplateRegistry()
+
+
+def get_template(path) -> Template:
+    """Returns the template at ``path`` from the process-wide registry."""
+    return _registry.get(path)
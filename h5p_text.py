@@ -0,0 +1,70 @@
+import html
+import re
+
+# Spelling conventions applied to the user-supplied texts by default
+SWISS_GERMAN = {"ß": "ss"}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class TextNormalizer:
+    """
+    Normalizes the user-supplied text fields of a quiz.
+
+    Applied to each question, answer, feedback and title text while it is
+    mapped, so generated values such as URLs, IDs and paths are never touched.
+    The configuration is compiled once; calling the normalizer runs, in order:
+
+    1. the character translations, as one ``str.replace`` per entry (much
+       faster than ``str.translate`` for the few entries used in practice);
+    2. whitespace cleanup: runs of whitespace become one space, and leading
+       and trailing whitespace is removed;
+    3. HTML escaping of ``&``, ``<`` and ``>``, for plain-text input that
+       must not be interpreted as markup.
+
+    Args:
+        translations (dict, optional): Replacement text keyed by the text it
+            replaces, applied in the given order.
+        collapse_whitespace (bool): Clean up whitespace.
+        escape_html (bool): Escape HTML special characters.
+    """
+
+    def __init__(self, translations=None, collapse_whitespace=False, escape_html=False):
+        self._replacements = tuple((old, new) for old, new in (translations or {}).items() if old != new)
+        self._collapse_whitespace = collapse_whitespace
+        self._escape_html = escape_html
+
+    @property
+    def key(self):
+        """The configuration, for cache keys."""
+        return self._replacements, self._collapse_whitespace, self._escape_html
+
+    def __call__(self, text):
+        if type(text) is not str:
+            return text
+        for old, new in self._replacements:
+            text = text.replace(old, new)
+        if self._collapse_whitespace:
+            text = _WHITESPACE.sub(" ", text).strip()
+        if self._escape_html:
+            text = html.escape(text, quote=False)
+        return text
+
+    def __eq__(self, other):
+        return isinstance(other, TextNormalizer) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        replacements, collapse_whitespace, escape_html = self.key
+        return (f"TextNormalizer({dict(replacements)!r}, collapse_whitespace={collapse_whitespace}, "
+                f"escape_html={escape_html})")
+
+
+DEFAULT_NORMALIZER = TextNormalizer(SWISS_GERMAN)
+
+
+def fold_text(text):
+    """Folds whitespace and case, so texts that differ only in those compare equal."""
+    return _WHITESPACE.sub(" ", str(text)).strip().casefold()
@@ -0,0 +1,297 @@
+import argparse
+import dataclasses
+import json
+import logging
+import mmap
+import os
+import sys
+import zipfile
+from pathlib import Path
+
+import h5p_metrics
+from h5p_core import QUESTION_RENDERERS, GenerationError, generate_uuid, report
+from h5p_fragments import dumps
+from h5p_libraries import content_libraries
+from h5p_text import DEFAULT_NORMALIZER
+from h5p_validation import DEFAULT_VALIDATOR
+from h5p_zip import PackageWriter, read_member, read_zip_index
+
+CONTENT_JSON = "content/content.json"
+H5P_JSON = "h5p.json"
+
+# Members behind the replaced ones are rewritten to avoid leaving dead bytes,
+# unless that would mean moving more than this
+MAX_MOVED_BYTES = 1024 * 1024
+
+
+def _question_set(content, section=None):
+    """
+    Returns the question set to update.
+
+    Packages built by h5p_series have one question set per section; ``section``
+    (counting from 0) picks one, and is required for them.
+    """
+    question_sets = [
+        item["content"] for item in content.get("content", [])
+        if item.get("content", {}).get("library", "").startswith("H5P.QuestionSet ")
+    ]
+    if not question_sets:
+        raise GenerationError("The package has no question set to update.")
+    if section is None:
+        if len(question_sets) > 1:
+            raise GenerationError(f"The package has {len(question_sets)} sections; choose the one to update.")
+        section = 0
+    if not 0 <= section < len(question_sets):
+        raise GenerationError(f"The package has no section {section + 1}, only {len(question_sets)}.")
+    return question_sets[section]
+
+
+def _match_ids(old_questions, new_questions):
+    """
+    Picks the subContentId of every new question.
+
+    A new question takes the id of an unclaimed old question of the same
+    library with the same text; otherwise that of the old question at the
+    same position among the questions of its library, if still unclaimed.
+    Returns None for questions that get a new id.
+    """
+    old = [
+        (q.get("library", "").split(" ")[0], q.get("params", {}).get("question"), q.get("subContentId"))
+        for q in old_questions
+    ]
+    by_text = {}
+    by_library = {}
+    for index, (library, text, _) in enumerate(old):
+        by_text.setdefault((library, text), []).append(index)
+        by_library.setdefault(library, []).append(index)
+
+    matches = [None] * len(new_questions)
+    claimed = set()
+    for position, key in enumerate(new_questions):
+        for index in by_text.get(key, ()):
+            if index not in claimed:
+                matches[position] = index
+                claimed.add(index)
+                break
+
+    library_positions = {}
+    for position, (library, _) in enumerate(new_questions):
+        rank = library_positions[library] = library_positions.get(library, -1) + 1
+        candidates = by_library.get(library, ())
+        if matches[position] is None and rank < len(candidates) and candidates[rank] not in claimed:
+            matches[position] = candidates[rank]
+            claimed.add(candidates[rank])
+    return [old[index][2] if index is not None else None for index in matches]
+
+
+def _render_update(content_json, json_data, title, messages, language, normalizer, section=None):
+    """Returns the updated content.json text and whether the title changed."""
+    content = json.loads(content_json)
+    question_set = _question_set(content, section)
+    params = question_set["params"]
+
+    supported = [q for q in json_data.get("questions", []) if isinstance(q, dict) and q.get("type") in QUESTION_RENDERERS]
+    keys = [(QUESTION_RENDERERS[q["type"]][0], normalizer(str(q.get("question", "Keine Frage gestellt.")))) for q in supported]
+    ids = _match_ids(params.get("questions", []), keys)
+
+    questions = []
+    for q, sub_content_id in zip(supported, ids):
+        id_factory = (lambda value=sub_content_id: value) if sub_content_id else generate_uuid
+        rendered = QUESTION_RENDERERS[q["type"]][1](q, messages, id_factory, language, normalizer)
+        if rendered:
+            questions.append(rendered)
+    if not questions:
+        raise GenerationError("No valid questions found in the JSON.")
+    kept = sum(1 for sub_content_id in ids if sub_content_id)
+    report(messages, "info", f"Kept the subContentId of {kept} of {len(questions)} questions")
+
+    params["questions"] = questions
+    title_changed = title is not None and title != params.get("introPage", {}).get("title")
+    if title_changed:
+        params.setdefault("introPage", {})["title"] = title
+        question_set.setdefault("metadata", {})["title"] = title
+    return dumps(content), title_changed
+
+
+def update_package(path, json_data, title=None, output=None, messages=None, language="de", date_time=None,
+                   normalizer=DEFAULT_NORMALIZER, validator=DEFAULT_VALIDATOR, section=None):
+    """
+    Replaces the questions of an existing .h5p package.
+
+    Only ``content/content.json`` is rewritten, plus ``h5p.json`` if the title
+    changes; every other member keeps its compressed bytes. Without ``output``
+    the package is updated in place: the new members and a new central
+    directory are written over the old central directory, so the update costs
+    little more than writing the new content.json. Questions that are still
+    there keep their subContentId (see _match_ids), so learner state stored by
+    the LMS survives the update.
+
+    An in-place update is not atomic; pass ``output`` to write a new package
+    through a temporary file instead (``output`` may equal ``path``). For the
+    same reason the questions are validated first, and any validation error
+    refuses the whole update rather than dropping the question.
+
+    Args:
+        path (str or Path): The package to update.
+        json_data (dict): The new questions JSON.
+        title (str, optional): A new quiz title; keeps the current one if None.
+        output (str or Path, optional): Where to write the updated package.
+        messages (list, optional): Receives non-fatal Message entries.
+        language (str): Language of the question UI texts.
+        date_time (tuple, optional): Timestamp of the rewritten members.
+        normalizer (TextNormalizer): Applied to every question text and the title.
+        validator (QuestionValidator, optional): Checks the questions first;
+            None skips validation, e.g. for input validated already.
+        section (int, optional): The section to update in a series package
+            (see h5p_series), counting from 0; required for those. A new
+            ``title`` then only renames the section.
+
+    Returns:
+        int: Number of bytes written.
+
+    Raises:
+        GenerationError: If the package cannot be updated with these questions.
+    """
+    if validator is not None:
+        result = validator.validate(json_data)
+        for issue in result.issues:
+            report(messages, issue.level, str(issue))
+        if result.errors:
+            raise GenerationError(
+                f"{len(result.errors)} validation errors, first: {result.errors[0]}; the package was not changed."
+            )
+
+    path = Path(path)
+    title = normalizer(title)
+    with h5p_metrics.stage("update", in_place=output is None) as fields:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            try:
+                members = read_zip_index(view)
+            except zipfile.BadZipFile as e:
+                raise GenerationError(f"{path} is not an H5P package: {e}") from e
+            by_name = {member.filename: member for member in members}
+            if CONTENT_JSON not in by_name or H5P_JSON not in by_name:
+                raise GenerationError(f"{path} is not an H5P package")
+            content_json, title_changed = _render_update(
+                read_member(view, by_name[CONTENT_JSON]).decode("utf-8"), json_data, title, messages, language, normalizer,
+                section
+            )
+            h5p_info = json.loads(read_member(view, by_name[H5P_JSON]))
+
+            # The package can only reference libraries it already ships or depends on
+            available = {(d["machineName"], d["majorVersion"], d["minorVersion"]) for d in h5p_info.get("preloadedDependencies", [])}
+            missing = [key for key in content_libraries(content_json) if key not in available]
+            if missing:
+                names = ", ".join(f"{name} {major}.{minor}" for name, major, minor in missing)
+                raise GenerationError(f"The package does not include {names}; rebuild it from the template instead.")
+
+            new_members = {CONTENT_JSON: content_json.encode("utf-8")}
+            if title_changed and section is None:
+                h5p_info["title"] = h5p_info["extraTitle"] = title
+                new_members[H5P_JSON] = json.dumps(h5p_info, indent=4).encode("utf-8")
+            kept = [member for member in members if member.filename not in new_members]
+
+            if output is not None:
+                written = _write_copy(Path(output), view, kept, new_members, date_time)
+            else:
+                cut, tail, moved = _plan_in_place(view, members, kept, new_members)
+        # The file is only truncated once it is no longer mapped
+        if output is None:
+            written = _append_in_place(path, cut, tail, moved, kept, new_members, date_time)
+        fields["bytes_out"] = written
+    return written
+
+
+def _plan_in_place(view, members, kept, new_members):
+    """
+    Decides where an in-place update starts writing.
+
+    Writing starts where the first replaced member was, moving the few members
+    behind it along, or else behind the last member that stays.
+
+    Returns:
+        tuple: The offset to write at, the raw bytes of the moved members from
+        that offset on, and the offsets of the moved members.
+    """
+    cut = min(member.local_offset for member in members if member.filename in new_members)
+    moved = [member for member in kept if member.local_offset >= cut]
+    if sum(member.local_length for member in moved) > MAX_MOVED_BYTES:
+        cut = max(member.local_offset + member.local_length for member in kept)
+        moved = []
+    moved_end = max((member.local_offset + member.local_length for member in moved), default=cut)
+    return cut, bytes(view[cut:moved_end]), {member.local_offset for member in moved}
+
+
+def _append_in_place(path, cut, tail, moved_offsets, kept, new_members, date_time):
+    with open(path, "r+b") as f:
+        f.seek(cut)
+        writer = PackageWriter(f, offset=cut)
+        for member in kept:
+            if member.local_offset in moved_offsets:
+                writer.copy(dataclasses.replace(member, local_offset=member.local_offset - cut), tail)
+            else:
+                writer.keep(member)
+        for filename, data in new_members.items():
+            writer.write(filename, data, date_time=date_time)
+        writer.close()
+        f.truncate()
+        return writer.size - cut
+
+
+def _write_copy(output, view, kept, new_members, date_time):
+    tmp_path = output.with_name(output.name + ".part")
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = PackageWriter(f)
+            for member in kept:
+                writer.copy(member, view)
+            for filename, data in new_members.items():
+                writer.write(filename, data, date_time=date_time)
+            writer.close()
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, output)
+    return writer.size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replace the questions of existing H5P packages.")
+    parser.add_argument("questions", help="The new questions JSON")
+    parser.add_argument("packages", nargs="+", help=".h5p packages to update in place")
+    parser.add_argument("--title", default=None, help="New quiz title")
+    parser.add_argument("--output", default=None, help="Write the updated package here instead (single package only)")
+    parser.add_argument("--section", type=int, default=None,
+                        help="Section to update in series packages, counting from 1")
+    args = parser.parse_args(argv)
+    if args.output and len(args.packages) > 1:
+        parser.error("--output needs exactly one package")
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.questions, encoding="utf-8") as f:
+        json_data = json.load(f)
+    if isinstance(json_data, list):
+        json_data = {"questions": json_data}
+
+    errors = DEFAULT_VALIDATOR.validate(json_data).errors
+    if errors:
+        for issue in errors:
+            print(f"{args.questions}: {issue}", file=sys.stderr)
+        print(f"{len(errors)} validation errors; no package was changed.", file=sys.stderr)
+        return 1
+
+    failures = 0
+    for package in args.packages:
+        try:
+            # Validated once above for all packages
+            written = update_package(package, json_data, title=args.title, output=args.output, validator=None,
+                                     section=args.section - 1 if args.section is not None else None)
+            print(f"{package}: {written} bytes written")
+        except (GenerationError, OSError, ValueError) as e:
+            failures += 1
+            print(f"{package}: {e}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
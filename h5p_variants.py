@@ -0,0 +1,164 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import zipfile
+from pathlib import Path
+
+from h5p_batch import read_spec_inputs
+from h5p_compression import PROFILES
+from h5p_core import DEFAULT_TEMPLATE, FIXED_DATE_TIME, GenerationError, Variant, iter_variants
+from h5p_libraries import load_manifest
+from h5p_zip import PackageWriter
+
+
+def load_variants(path, defaults=None):
+    """
+    Loads a JSON list of variant settings (the fields of Variant).
+
+    Args:
+        defaults (dict, optional): Settings for the fields a variant leaves out.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [Variant(**dict(defaults or {}, **entry)) for entry in json.load(f)]
+
+
+def shuffled_variants(count, seed=0, pool_size=7, pass_percentage=75):
+    """Returns ``count`` fixed-order variants with differently shuffled questions, e.g. for exams."""
+    return [
+        Variant(name=f"version-{i + 1}", randomization=False, pool_size=pool_size, pass_percentage=pass_percentage,
+                shuffle_seed=seed + i)
+        for i in range(count)
+    ]
+
+
+class VariantFiles:
+    """
+    Writes variant packages to ``<output_dir>/<name>.h5p``.
+
+    Pass ``sink`` as the sink_factory of iter_variants and the generator to
+    ``write``: each package is streamed into a temporary file while it is
+    built and renamed once complete, so embedded media never sit in memory.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._open = None  # (file, temporary path, output path) of the package being written
+
+    def sink(self, variant):
+        output_path = self.output_dir / f"{variant.name}.h5p"
+        tmp_path = output_path.with_name(output_path.name + ".part")
+        self._open = (open(tmp_path, "wb"), tmp_path, output_path)
+        return self._open[0]
+
+    def write(self, packages):
+        """
+        Moves each package yielded by iter_variants into place.
+
+        Returns:
+            int: Number of packages written.
+        """
+        count = 0
+        try:
+            for _ in packages:
+                f, tmp_path, output_path = self._open
+                self._open = None
+                f.close()
+                os.replace(tmp_path, output_path)
+                count += 1
+        finally:
+            if self._open is not None:
+                f, tmp_path, _ = self._open
+                self._open = None
+                f.close()
+                tmp_path.unlink(missing_ok=True)
+        return count
+
+
+def write_variant_archive(packages, path, date_time=None):
+    """
+    Writes all variant packages into one ZIP archive, stored uncompressed
+    since the packages are compressed already.
+
+    Args:
+        date_time (tuple, optional): Timestamp of the archive members; defaults to now.
+
+    Returns:
+        int: Number of packages written.
+    """
+    tmp_path = Path(str(path) + ".part")
+    count = 0
+    try:
+        with open(tmp_path, "wb") as f, PackageWriter(f) as writer:
+            for variant, package in packages:
+                writer.write(f"{variant.name}.h5p", package, compress_type=zipfile.ZIP_STORED, date_time=date_time)
+                count += 1
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build several variants of one quiz in a single pass.")
+    parser.add_argument("spec", help="Quiz spec JSON, in the format read by h5p_batch")
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--variants", help="JSON list of variant settings (name, randomization, pool_size, ...)")
+    selection.add_argument("--shuffled", type=int, help="Build this many fixed-order versions with shuffled questions")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first shuffled version")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output-dir", help="Directory the variant packages are written to")
+    output.add_argument("--archive", help="ZIP archive the variant packages are written to")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Template ZIP archive")
+    parser.add_argument("--deterministic", action="store_true", help="Produce identical packages for identical inputs")
+    parser.add_argument("--manifest", default=None,
+                        help="Write content-only packages for a host with the libraries in this manifest")
+    parser.add_argument("--compression", choices=list(PROFILES), default="balanced", help="Compression profile")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    spec_path = Path(args.spec)
+    with open(spec_path, encoding="utf-8") as f:
+        spec = json.load(f)
+    if args.archive and spec.get("media_file"):
+        parser.error("variants with a media_file can only be written with --output-dir")
+    json_data, image_bytes = read_spec_inputs(spec, spec_path.parent)
+    if args.variants:
+        defaults = {key: spec[key] for key in ("randomization", "pool_size", "pass_percentage") if key in spec}
+        variants = load_variants(args.variants, defaults)
+    else:
+        variants = shuffled_variants(args.shuffled, args.seed, spec.get("pool_size", 7), spec.get("pass_percentage", 75))
+
+    files = VariantFiles(args.output_dir) if args.output_dir else None
+    packages = iter_variants(
+        media_url=spec.get("media_url", ""),
+        media_type=spec.get("media_type", "video"),
+        json_data=json_data,
+        template_path=Path(args.template).resolve(),
+        title=spec.get("title", "Video Quiz"),
+        variants=variants,
+        user_image=image_bytes,
+        media_file=spec_path.parent / spec["media_file"] if spec.get("media_file") else None,
+        deterministic=args.deterministic,
+        include_editor=spec.get("include_editor", True),
+        installed_libraries=load_manifest(args.manifest) if args.manifest else None,
+        compression=args.compression,
+        sink_factory=files.sink if files else None
+    )
+    try:
+        if args.archive:
+            count = write_variant_archive(packages, args.archive, FIXED_DATE_TIME if args.deterministic else None)
+        else:
+            count = files.write(packages)
+    except GenerationError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{count} variants written to {args.archive or args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,410 @@
+import io
+import struct
+import time
+import zlib
+import zipfile
+from dataclasses import dataclass
+
+# ZIP record layouts (see PKWARE APPNOTE.TXT, sections 4.3.7, 4.3.9, 4.3.12 and 4.3.16)
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_DESCRIPTOR = struct.Struct("<4s3L")
+
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_SIGNATURE = b"PK\x01\x02"
+_END_SIGNATURE = b"PK\x05\x06"
+_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_CENTRAL_OFFSET_FIELD = 42  # Position of the local header offset in a central record
+_MAX_END_SEARCH = _END_RECORD.size + 0xFFFF  # End record plus the largest possible comment
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ZipMember:
+    """A member of an existing ZIP archive, located by its raw byte ranges."""
+    filename: str
+    flag_bits: int
+    compress_type: int
+    crc: int
+    compress_size: int
+    file_size: int
+    local_offset: int
+    local_length: int
+    data_offset: int
+    central_record: bytes
+
+
+@dataclass(frozen=True)
+class MemberBlock:
+    """Archive members laid out once as local records, ready to be written into many archives."""
+    data: bytes
+    central_records: tuple  # Central records relative to the start of the block
+    uncompressed_size: int
+
+
+def read_zip_index(data) -> list:
+    """
+    Parses the central directory of a ZIP archive without inflating any member.
+
+    Args:
+        data (bytes-like): The complete archive.
+
+    Returns:
+        list[ZipMember]: The members in central directory order.
+
+    Raises:
+        zipfile.BadZipFile: If the archive is malformed.
+        zipfile.LargeZipFile: If the archive requires ZIP64 extensions.
+    """
+    # Released on exit, even on errors, so the caller can close an mmap it passed in
+    with memoryview(data) as view:
+        search_start = max(0, len(view) - _MAX_END_SEARCH)
+        end_offset = bytes(view[search_start:]).rfind(_END_SIGNATURE)
+        if end_offset < 0:
+            raise zipfile.BadZipFile("End of central directory record not found")
+        end_offset += search_start
+
+        _, _, _, _, count, cd_size, cd_offset, _ = _END_RECORD.unpack_from(view, end_offset)
+        if count == 0xFFFF or cd_offset == _ZIP32_LIMIT:
+            raise zipfile.LargeZipFile("ZIP64 archives are not supported")
+
+        members = []
+        position = cd_offset
+        for _ in range(count):
+            (signature, _, _, flag_bits, compress_type, _, _, crc, compress_size,
+             file_size, name_len, extra_len, comment_len, _, _, _, local_offset) = _CENTRAL_HEADER.unpack_from(view, position)
+            if signature != _CENTRAL_SIGNATURE:
+                raise zipfile.BadZipFile(f"Bad central directory record at offset {position}")
+            record_len = _CENTRAL_HEADER.size + name_len + extra_len + comment_len
+            raw_name = bytes(view[position + _CENTRAL_HEADER.size:position + _CENTRAL_HEADER.size + name_len])
+            filename = raw_name.decode("utf-8" if flag_bits & _FLAG_UTF8 else "cp437")
+
+            # The local header may carry a different extra field than the central record
+            local_sig, *_, local_name_len, local_extra_len = _LOCAL_HEADER.unpack_from(view, local_offset)
+            if local_sig != _LOCAL_SIGNATURE:
+                raise zipfile.BadZipFile(f"Bad local header for {filename}")
+            data_offset = local_offset + _LOCAL_HEADER.size + local_name_len + local_extra_len
+            local_end = data_offset + compress_size
+            if flag_bits & _FLAG_DATA_DESCRIPTOR:
+                has_signature = bytes(view[local_end:local_end + 4]) == _DESCRIPTOR_SIGNATURE
+                local_end += 16 if has_signature else 12
+
+            members.append(ZipMember(
+                filename=filename,
+                flag_bits=flag_bits,
+                compress_type=compress_type,
+                crc=crc,
+                compress_size=compress_size,
+                file_size=file_size,
+                local_offset=local_offset,
+                local_length=local_end - local_offset,
+                data_offset=data_offset,
+                central_record=bytes(view[position:position + record_len]),
+            ))
+            position += record_len
+
+    return members
+
+
+def read_member(data, member: ZipMember) -> bytes:
+    """
+    Returns the uncompressed content of a single archive member.
+
+    Args:
+        data (bytes-like): The complete archive.
+        member (ZipMember): The member to extract.
+
+    Returns:
+        bytes: The uncompressed member content.
+    """
+    with memoryview(data) as view, view[member.data_offset:member.data_offset + member.compress_size] as raw:
+        if member.compress_type == zipfile.ZIP_STORED:
+            content = bytes(raw)
+        elif member.compress_type == zipfile.ZIP_DEFLATED:
+            content = zlib.decompress(raw, -15)
+        else:
+            raise NotImplementedError(f"Unsupported compression method {member.compress_type} for {member.filename}")
+    if zlib.crc32(content) != member.crc:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for {member.filename}")
+    return content
+
+
+def _dos_datetime(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+class PackageWriter:
+    """
+    Writes a ZIP archive sequentially to a binary file-like object.
+
+    Members of an existing archive can be copied as raw records, so their
+    compressed data and CRCs are reused as-is. New members are compressed once.
+    The sink only needs a ``write`` method; it is never seeked or read.
+
+    To append to an existing archive in place, pass the position the sink is
+    at as ``offset`` and list the members that stay where they are with keep.
+    """
+
+    def __init__(self, fp, offset=0):
+        self._fp = fp
+        self._offset = offset
+        self._uncompressed = 0
+        self._central = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    @property
+    def size(self):
+        """Bytes written to the sink so far."""
+        return self._offset
+
+    @property
+    def central_records(self):
+        """The central directory records of the members written so far."""
+        return tuple(self._central)
+
+    @property
+    def uncompressed_size(self):
+        """Total uncompressed size of the members added so far."""
+        return self._uncompressed
+
+    def _write(self, data):
+        self._fp.write(data)
+        self._offset += len(data)
+
+    def copy(self, member: ZipMember, source):
+        """
+        Copies a member from another archive byte-for-byte.
+
+        Args:
+            member (ZipMember): The member, as returned by read_zip_index.
+            source (bytes-like): The archive the member was indexed from.
+        """
+        central = bytearray(member.central_record)
+        struct.pack_into("<L", central, _CENTRAL_OFFSET_FIELD, self._offset)
+        self._central.append(bytes(central))
+        self._uncompressed += member.file_size
+        self._write(memoryview(source)[member.local_offset:member.local_offset + member.local_length])
+
+    def extend(self, block: MemberBlock):
+        """
+        Writes a block of members prepared by build_block.
+
+        Args:
+            block (MemberBlock): The members to add.
+        """
+        for record in block.central_records:
+            central = bytearray(record)
+            (offset,) = struct.unpack_from("<L", central, _CENTRAL_OFFSET_FIELD)
+            struct.pack_into("<L", central, _CENTRAL_OFFSET_FIELD, offset + self._offset)
+            self._central.append(bytes(central))
+        self._uncompressed += block.uncompressed_size
+        self._write(block.data)
+
+    def keep(self, member: ZipMember):
+        """
+        Lists a member that is already in the sink at its recorded offset.
+
+        Args:
+            member (ZipMember): The member, as indexed from the archive being appended to.
+        """
+        self._central.append(member.central_record)
+        self._uncompressed += member.file_size
+
+    def _begin_member(self, filename, compress_type, version, crc, compress_size, file_size, date_time, flags=0):
+        """Writes a local header; returns the fields the member's central record repeats."""
+        if file_size >= _ZIP32_LIMIT or compress_size >= _ZIP32_LIMIT or self._offset >= _ZIP32_LIMIT:
+            raise zipfile.LargeZipFile(f"{filename} would require ZIP64 extensions")
+
+        try:
+            raw_name = filename.encode("ascii")
+            flag_bits = flags
+        except UnicodeEncodeError:
+            raw_name = filename.encode("utf-8")
+            flag_bits = flags | _FLAG_UTF8
+        dos_time, dos_date = _dos_datetime(date_time or time.localtime()[:6])
+
+        header = (raw_name, version, flag_bits, compress_type, dos_time, dos_date, self._offset)
+        self._write(_LOCAL_HEADER.pack(
+            _LOCAL_SIGNATURE, version, flag_bits, compress_type, dos_time, dos_date,
+            crc, compress_size, file_size, len(raw_name), 0,
+        ) + raw_name)
+        return header
+
+    def _end_member(self, header, crc, compress_size, file_size):
+        raw_name, version, flag_bits, compress_type, dos_time, dos_date, offset = header
+        self._central.append(_CENTRAL_HEADER.pack(
+            _CENTRAL_SIGNATURE, (3 << 8) | version, version, flag_bits, compress_type, dos_time, dos_date,
+            crc, compress_size, file_size, len(raw_name), 0, 0, 0, 0, 0o644 << 16, offset,
+        ) + raw_name)
+        self._uncompressed += file_size
+
+    def write(self, filename: str, data: bytes, compress_type=zipfile.ZIP_DEFLATED, date_time=None,
+              level=zlib.Z_DEFAULT_COMPRESSION):
+        """
+        Adds a new member to the archive.
+
+        Args:
+            filename (str): The member name inside the archive.
+            data (bytes): The uncompressed content.
+            compress_type (int): zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED.
+            date_time (tuple, optional): Modification time; defaults to now.
+            level (int): Deflate level, 0-9 or zlib.Z_DEFAULT_COMPRESSION.
+        """
+        if compress_type == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            payload = compressor.compress(data) + compressor.flush()
+        elif compress_type == zipfile.ZIP_STORED:
+            payload = data
+        else:
+            raise NotImplementedError(f"Unsupported compression method {compress_type}")
+        self.write_compressed(filename, payload, compress_type, zlib.crc32(data), len(data), date_time)
+
+    def write_compressed(self, filename: str, payload: bytes, compress_type, crc: int, file_size: int, date_time=None):
+        """
+        Adds a new member whose content was compressed already, e.g. in parallel.
+
+        Args:
+            filename (str): The member name inside the archive.
+            payload (bytes): The raw deflate stream, or the content if stored.
+            compress_type (int): zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED.
+            crc (int): CRC-32 of the uncompressed content.
+            file_size (int): Size of the uncompressed content.
+            date_time (tuple, optional): Modification time; defaults to now.
+        """
+        version = 20 if compress_type == zipfile.ZIP_DEFLATED else 10
+        header = self._begin_member(filename, compress_type, version, crc, len(payload), file_size, date_time)
+        self._write(payload)
+        self._end_member(header, crc, len(payload), file_size)
+
+    def write_chunks(self, filename: str, chunks, size: int, crc: int, date_time=None):
+        """
+        Adds a stored member whose content arrives in chunks, yielding after each one.
+
+        The headers are written first, so ``size`` and ``crc`` must be known
+        up front; only one chunk is held in memory at a time.
+
+        Args:
+            filename (str): The member name inside the archive.
+            chunks (iterable[bytes]): The content.
+            size (int): Total size of the content.
+            crc (int): CRC-32 of the content.
+            date_time (tuple, optional): Modification time; defaults to now.
+
+        Raises:
+            ValueError: If the chunks don't match ``size`` and ``crc``, e.g.
+                because the file changed while it was read. The archive is
+                unusable in that case.
+        """
+        header = self._begin_member(filename, zipfile.ZIP_STORED, 10, crc, size, size, date_time)
+        written, actual_crc = 0, 0
+        for chunk in chunks:
+            actual_crc = zlib.crc32(chunk, actual_crc)
+            written += len(chunk)
+            self._write(chunk)
+            yield
+        if written != size or actual_crc != crc:
+            raise ValueError(f"Content of {filename} changed while it was written")
+        self._end_member(header, crc, size, size)
+
+    def write_stream(self, filename: str, chunks, date_time=None, level=zlib.Z_DEFAULT_COMPRESSION):
+        """
+        Adds a deflated member of unknown size whose content arrives in chunks,
+        yielding after each one.
+
+        The CRC and sizes follow the compressed data in a data descriptor, so
+        neither the content nor its compressed form is ever held as a whole.
+
+        Args:
+            filename (str): The member name inside the archive.
+            chunks (iterable[bytes]): The uncompressed content.
+            date_time (tuple, optional): Modification time; defaults to now.
+            level (int): Deflate level, 0-9 or zlib.Z_DEFAULT_COMPRESSION.
+        """
+        header = self._begin_member(filename, zipfile.ZIP_DEFLATED, 20, 0, 0, 0, date_time, flags=_FLAG_DATA_DESCRIPTOR)
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        crc, file_size, compress_size = 0, 0, 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            compressed = compressor.compress(chunk)
+            if compressed:
+                compress_size += len(compressed)
+                self._write(compressed)
+            yield
+        compressed = compressor.flush()
+        compress_size += len(compressed)
+        self._write(compressed)
+        if file_size >= _ZIP32_LIMIT or compress_size >= _ZIP32_LIMIT:
+            raise zipfile.LargeZipFile(f"{filename} would require ZIP64 extensions")
+        self._write(_DESCRIPTOR.pack(_DESCRIPTOR_SIGNATURE, crc, compress_size, file_size))
+        self._end_member(header, crc, compress_size, file_size)
+
+    def close(self):
+        """Writes the central directory and the end of central directory record."""
+        if len(self._central) >= 0xFFFF:
+            raise zipfile.LargeZipFile("Too many members for a ZIP archive without ZIP64 extensions")
+        cd_offset = self._offset
+        for record in self._central:
+            self._write(record)
+        self._write(_END_RECORD.pack(
+            _END_SIGNATURE, 0, 0, len(self._central), len(self._central),
+            self._offset - cd_offset, cd_offset, 0,
+        ))
+
+
+def build_block(members, source) -> MemberBlock:
+    """
+    Copies members of an archive into a reusable block (see PackageWriter.extend).
+
+    Args:
+        members (list[ZipMember]): The members, as returned by read_zip_index.
+        source (bytes-like): The archive the members were indexed from.
+    """
+    buffer = io.BytesIO()
+    writer = PackageWriter(buffer)
+    for member in members:
+        writer.copy(member, source)
+    return MemberBlock(buffer.getvalue(), writer.central_records, writer.uncompressed_size)
+
+
+class ChunkBuffer:
+    """
+    A write-only sink that collects output until it can be handed out in chunks.
+
+    Used with PackageWriter to turn an archive into a generator of byte chunks.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def drain(self, final=False):
+        """
+        Yields the buffered output in chunks of ``chunk_size`` bytes.
+
+        Args:
+            final (bool): Also yield the last, possibly shorter, chunk.
+        """
+        while len(self._buffer) >= self._chunk_size:
+            yield bytes(self._buffer[:self._chunk_size])
+            del self._buffer[:self._chunk_size]
+        if final and self._buffer:
+            yield bytes(self._buffer)
+            self._buffer.clear()